@@ -17,11 +17,23 @@ app.add_middleware(
 )
 
 # Import routes
-from routes import detect, download, analyze
+from routes import detect, download, analyze, live
 
 app.include_router(detect.router, prefix="/api", tags=["detection"])
 app.include_router(download.router, prefix="/api", tags=["download"])
 app.include_router(analyze.router, prefix="/api", tags=["analysis"])
+app.include_router(live.router, prefix="/api", tags=["analysis"])
+
+@app.on_event("shutdown")
+def flush_storage():
+    # Commit queued analysis writes before the process exits
+    from services.storage import writer
+    writer.stop()
+
+@app.on_event("shutdown")
+def stop_downloads():
+    from services.download_manager import download_manager
+    download_manager.shutdown()
 
 @app.get("/")
 def root():
@@ -1,13 +1,31 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Optional
 import base64
 import io
+import os
+import sys
+import time
+import struct
+import importlib
+import asyncio
+import numpy as np
 from PIL import Image
 import uuid
+from services.frame_dedup import FrameDeduplicator
 
 router = APIRouter()
 
+FRAME_MAX_SIDE = 480     # frames are decoded straight to this size (the classifier works at 224)
+MAX_BATCH_FRAMES = 64
+
+# The deepfake models live with the main analyzers in hackcryp/backend/services
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_model_modules = {}
+
+# Near-identical frames (paused video) in a batch reuse the scores of the frame already analyzed
+frame_dedup = FrameDeduplicator()
+
 class FrameBatchRequest(BaseModel):
     frames: List[str]  # List of base64 encoded images
     count: int
@@ -21,51 +39,154 @@ class AnalysisResult(BaseModel):
     audio_score: float
     temporal_score: float
 
-def generate_mock_analysis():
-    """Generate mock analysis results - replace with real AI model"""
-    import random
+def get_model_module(name: str):
+    """Import one of the hackcryp analyzer modules (loading its models) on first use"""
+    if name not in _model_modules:
+        for path in (ROOT_DIR, os.path.join(ROOT_DIR, "hackcryp", "backend", "services")):
+            if path not in sys.path:
+                sys.path.append(path)
+        _model_modules[name] = importlib.import_module(name)
+    return _model_modules[name]
+
+def get_face_detector():
+    return get_model_module("face_detector")
+
+def split_length_prefixed(body: bytes) -> List[memoryview]:
+    """Frames of an application/octet-stream batch: repeated [uint32 big-endian length][JPEG bytes]"""
+    view = memoryview(body)
+    frames = []
+    offset = 0
+    while offset < len(view):
+        if offset + 4 > len(view):
+            raise ValueError("Truncated frame header")
+        (length,) = struct.unpack_from(">I", view, offset)
+        offset += 4
+        if offset + length > len(view):
+            raise ValueError("Truncated frame data")
+        frames.append(view[offset:offset + length])
+        offset += length
+    return frames
+
+def decode_frame_batch(encoded: List[bytes], max_side: int = FRAME_MAX_SIDE) -> np.ndarray:
+    """
+    Decode JPEG/PNG frames into one preallocated (N, H, W, 3) uint8 RGB batch.
+    The batch size comes from the first frame scaled to `max_side`; JPEGs are
+    decoded at reduced scale by libjpeg (draft mode) instead of full size.
+    """
+    batch = None
+    for index, data in enumerate(encoded):
+        img = Image.open(io.BytesIO(data))
+        if batch is None:
+            scale = min(1.0, max_side / max(img.size))
+            width, height = max(1, round(img.width * scale)), max(1, round(img.height * scale))
+            batch = np.empty((len(encoded), height, width, 3), dtype=np.uint8)
+        img.draft("RGB", (width, height))
+        img = img.convert("RGB")
+        if img.size != (width, height):
+            img = img.resize((width, height), Image.BILINEAR)
+        batch[index] = np.asarray(img)
+    return batch
+
+async def read_frame_batch(request: Request) -> List[bytes]:
+    """Encoded frames from a multipart, length-prefixed binary or (legacy) base64 JSON body"""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        return [await item.read() for _, item in form.multi_items() if hasattr(item, "read")]
+    if content_type.startswith("application/octet-stream"):
+        return split_length_prefixed(await request.body())
+    
+    # Legacy: {"frames": ["data:image/jpeg;base64,...", ...], "count": n}
+    batch = FrameBatchRequest(**(await request.json()))
+    return [base64.b64decode(frame.split(",", 1)[-1]) for frame in batch.frames]
+
+def run_frame_inference(frames: np.ndarray, decode_ms: float):
+    """Detect faces and classify a decoded frame batch (blocking)"""
+    face_detector = get_face_detector()
+    
+    t0 = time.perf_counter()
+    analyze, sources = frame_dedup.plan(frames)
+    dedup_ms = (time.perf_counter() - t0) * 1000
     
-    # Scenario: AI lip-syncing detection
-    # These are realistic scores for detected lip-sync deepfakes
+    new_scores, new_faces = [], []
+    timing_ms = {"face_detection": 0.0, "classification": 0.0}
+    if analyze:
+        new_scores, new_faces, timing_ms = face_detector.score_frame_batch([frames[i] for i in analyze])
+    
+    scores = [new_scores[position] for position in sources]
+    faces_per_frame = [new_faces[position] for position in sources]
+    
+    # Per-batch aggregate: mean fake probability, share of frames flagged
+    fake_probs = np.asarray(scores) / 100.0
+    fake_prob = float(fake_probs.mean())
+    flagged = float((fake_probs > 0.5).mean())
+    is_fake = fake_prob > 0.5
+    
+    if fake_prob > 0.8:
+        threat_level = 'HIGH'
+    elif fake_prob > 0.5:
+        threat_level = 'MEDIUM'
+    else:
+        threat_level = 'LOW'
     
     return {
         'success': True,
-        'confidence': 0.87,  # High confidence in detection
-        'threat_level': 'HIGH',  # Clear threat detected
-        'threat_type': 'lip_sync',  # AI lip-syncing detected
-        'visual_score': 0.92,  # Visual model caught facial anomalies
-        'audio_score': 0.76,  # Audio detected slight sync issues
-        'temporal_score': 0.84,  # Temporal inconsistencies detected
+        'confidence': round(fake_prob if is_fake else 1 - fake_prob, 4),
+        'threat_level': threat_level,
+        'threat_type': 'face_swap' if is_fake else 'none',
+        'authentic': not is_fake,
+        'visual_score': round(fake_prob, 4),
+        'audio_score': 0.0,       # frames only, no audio track
+        'temporal_score': round(flagged, 4),
+        'frames_analyzed': len(scores),
+        'frames_inferred': len(analyze),
+        'frames_skipped': len(scores) - len(analyze),
+        'skip_ratio': round(1 - len(analyze) / len(scores), 4),
+        'faces_detected': int(sum(faces_per_frame)),
+        'frame_scores': [round(score, 2) for score in scores],
+        'frame_size': [int(frames.shape[2]), int(frames.shape[1])],
+        'timing_ms': {
+            'decode': round(decode_ms, 1),
+            'dedup': round(dedup_ms, 1),
+            **timing_ms,
+            'total': round(decode_ms + (time.perf_counter() - t0) * 1000, 1)
+        }
     }
 
 @router.post("/analyze-frames")
-async def analyze_frame_batch(request: FrameBatchRequest):
+async def analyze_frame_batch(request: Request):
     """
     Analyze a batch of frames collected from screen recording
     
-    Args:
-        frames: List of base64 encoded image frames
-        count: Number of frames in batch
+    Body (any of):
+        multipart/form-data: one file part per frame (JPEG/PNG)
+        application/octet-stream: repeated [uint32 big-endian length][frame bytes]
+        application/json: {"frames": [base64 frames], "count": n} (legacy)
     
     Returns:
-        Analysis overview with threat level, confidence, and metric scores
+        Analysis overview with threat level, confidence, metric scores,
+        per-frame scores and timing. visual_score is the mean fake probability,
+        temporal_score the share of frames classified fake. Frames that match
+        an already analyzed frame are not re-inferred (frames_skipped).
     """
     try:
-        if not request.frames or len(request.frames) == 0:
+        encoded = await read_frame_batch(request)
+        if not encoded:
             raise HTTPException(status_code=400, detail="No frames provided")
+        if len(encoded) > MAX_BATCH_FRAMES:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_FRAMES} frames per batch")
         
-        # TODO: Replace with actual AI model inference
-        # For now, return mock results
-        result = generate_mock_analysis()
-        
-        # In production:
-        # 1. Decode frames from base64
-        # 2. Run through TensorFlow/PyTorch model
-        # 3. Aggregate results across frames
-        # 4. Return aggregated analysis
-        
-        return result
-        
+        t0 = time.perf_counter()
+        frames = await asyncio.to_thread(decode_frame_batch, encoded)
+        decode_ms = (time.perf_counter() - t0) * 1000
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid frame batch: {e}")
+    
+    try:
+        # Model inference is CPU-bound - keep it off the event loop
+        return await asyncio.to_thread(run_frame_inference, frames, decode_ms)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -80,18 +201,24 @@ async def analyze_single_frame(file: UploadFile = File(...)):
     Returns:
         Analysis result for the frame
     """
+    if not file:
+        raise HTTPException(status_code=400, detail="No file provided")
+    
     try:
-        if not file:
-            raise HTTPException(status_code=400, detail="No file provided")
-        
-        # Read image
         contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        
-        # TODO: Run through model
-        result = generate_mock_analysis()
-        
-        return result
-        
+        t0 = time.perf_counter()
+        frames = await asyncio.to_thread(decode_frame_batch, [contents])
+        decode_ms = (time.perf_counter() - t0) * 1000
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+    
+    try:
+        # Same pipeline as a one-frame batch (a repeat of a recent frame is not re-inferred)
+        return await asyncio.to_thread(run_frame_inference, frames, decode_ms)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analyze-frames/stats")
+async def frame_dedup_stats():
+    """Frames seen vs. skipped by the duplicate-frame check since startup."""
+    return {'success': True, **frame_dedup.stats()}
@@ -38,9 +38,9 @@ async def detect_deepfake(
         
         # Handle URL (YOUR yt-dlp code will go here)
         elif video_url:
-            from services.media_downloader import download_video
+            from services.download_manager import download_manager
             
-            result = download_video(video_url)
+            result = await download_manager.download(video_url)
             
             if not result['success']:
                 raise HTTPException(
@@ -1,49 +1,103 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from typing import Optional
 import uuid
-from services.media_downloader import download_video
-from services.storage import save_video_metadata, get_video, list_videos
+import hashlib
+from services.download_manager import download_manager
+from services.url_cache import UrlCache, RequestCoalescer, canonicalize_url
+from services.storage import (
+    save_video_metadata_async, get_video_async,
+    list_videos_page_async, list_analyses_page_async, get_writer_metrics
+)
 import os
 
 router = APIRouter()
 
+# Same video (any URL form) is downloaded once; concurrent requests share it
+url_cache = UrlCache("storage/url_cache.db")
+inflight_downloads = RequestCoalescer()
+
 class DownloadRequest(BaseModel):
     url: str
 
+def file_sha256(file_path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+async def find_downloaded(entry):
+    """Stored video behind a URL-cache entry, if its file is still on disk"""
+    if not entry or not entry.get('payload'):
+        return None
+    video = await get_video_async(entry['payload']['video_id'])
+    if video and video.get('file_path') and os.path.exists(video['file_path']):
+        return video
+    return None
+
+def downloaded_response(video, cached: bool):
+    return {
+        'success': True,
+        'video_id': video['id'],
+        'file_path': video['file_path'],
+        'title': video['title'],
+        'duration': video['duration'],
+        'platform': video['platform'],
+        'cached': cached
+    }
+
 @router.post("/download")
 async def download_media(request: DownloadRequest):
     """
     Download video from URL (YouTube, Twitter, Instagram, TikTok)
     and store metadata in SQLite.
     """
+    # Already downloaded under this (or an equivalent) URL?
+    video = await find_downloaded(url_cache.lookup(request.url))
+    if video:
+        return downloaded_response(video, cached=True)
+    
+    return await inflight_downloads.run(canonicalize_url(request.url), lambda: download_and_store(request.url))
+
+async def download_and_store(url: str):
     try:
-        # Download the video
-        result = download_video(request.url)
+        # Download the video (queued behind the per-platform download limits)
+        result = await download_manager.download(url)
         
         if not result['success']:
             raise HTTPException(status_code=400, detail=result.get('error', 'Download failed'))
         
+        # Same media already stored under another URL? Keep the first copy
+        file_path = result['video_path']
+        content_hash = file_sha256(file_path)
+        existing = await find_downloaded(url_cache.find_by_content(content_hash))
+        if existing:
+            os.remove(file_path)
+            url_cache.store(url, content_hash, {'video_id': existing['id']})
+            return downloaded_response(existing, cached=True)
+        
         # Generate ID for tracking
         video_id = str(uuid.uuid4())
         
         # Extract metadata
         metadata = result.get('metadata', {})
-        platform = detect_platform(request.url)
+        platform = detect_platform(url)
         
         # Get file size
-        file_path = result['video_path']
         file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
         
         # Save to database
-        save_video_metadata(
+        await save_video_metadata_async(
             video_id=video_id,
-            url=request.url,
+            url=url,
             platform=platform,
             file_path=file_path,
             title=metadata.get('title', 'Unknown'),
             duration=metadata.get('duration', 0),
             file_size=file_size
         )
+        url_cache.store(url, content_hash, {'video_id': video_id})
         
         return {
             'success': True,
@@ -51,25 +105,88 @@ async def download_media(request: DownloadRequest):
             'file_path': file_path,
             'title': metadata.get('title'),
             'duration': metadata.get('duration'),
-            'platform': platform
+            'platform': platform,
+            'cached': False
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/downloads")
+async def queue_download(request: DownloadRequest):
+    """Queue a download without waiting for it; poll /downloads/{job_id} for progress."""
+    job = download_manager.submit(request.url)
+    return {'success': True, 'job': job.to_dict()}
+
+@router.get("/downloads")
+async def list_downloads(limit: int = 50):
+    """Recent download jobs (newest first) and the manager's queue state."""
+    return {'success': True, 'jobs': download_manager.jobs(limit), **download_manager.stats()}
+
+@router.get("/downloads/{job_id}")
+async def get_download(job_id: str):
+    """Status and progress of one download job."""
+    job = download_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Download job not found")
+    return {'success': True, 'job': job.to_dict()}
+
+@router.delete("/downloads/{job_id}")
+async def cancel_download(job_id: str):
+    """Cancel a queued or running download."""
+    job = download_manager.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Download job not found")
+    return {'success': True, 'job': job.to_dict()}
+
 @router.get("/videos")
-async def list_all_videos():
-    """Get list of all downloaded videos."""
+async def list_all_videos(limit: int = 50, cursor: Optional[str] = None, fields: Optional[str] = None,
+                          platform: Optional[str] = None, analysis_status: Optional[str] = None,
+                          threat_level: Optional[str] = None, include_analysis: bool = False):
+    """
+    Get downloaded videos, newest first, one page at a time.
+    Pass `next_cursor` back as `cursor` for the next page; `fields` is a
+    comma-separated column list.
+    """
     try:
-        videos = list_videos()
-        return {'success': True, 'videos': videos}
+        page = await list_videos_page_async(
+            limit=limit,
+            cursor=cursor,
+            columns=fields.split(",") if fields else None,
+            platform=platform,
+            analysis_status=analysis_status,
+            threat_level=threat_level,
+            include_latest_analysis=include_analysis
+        )
+        return {'success': True, **page}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/analyses")
+async def list_all_analyses(limit: int = 50, cursor: Optional[str] = None,
+                            video_id: Optional[str] = None, threat_type: Optional[str] = None):
+    """Get analysis results, newest first, one page at a time."""
+    try:
+        page = await list_analyses_page_async(
+            limit=limit, cursor=cursor, video_id=video_id, threat_type=threat_type
+        )
+        return {'success': True, **page}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/storage/metrics")
+async def storage_metrics():
+    """Queue depth and flush latency of the background storage writer."""
+    return {'success': True, 'writer': get_writer_metrics()}
+
 @router.get("/video/{video_id}")
 async def get_video_info(video_id: str):
     """Get specific video metadata."""
     try:
-        video = get_video(video_id)
+        video = await get_video_async(video_id)
         if not video:
             raise HTTPException(status_code=404, detail="Video not found")
         return {'success': True, 'video': video}
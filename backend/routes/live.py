@@ -0,0 +1,233 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from collections import deque
+from typing import Optional, Tuple
+import time
+import json
+import asyncio
+import cv2
+
+from routes.analyze import get_model_module, decode_frame_batch
+
+router = APIRouter()
+
+MAX_LIVE_SESSIONS = 8
+BLINK_WINDOW_SECONDS = 60     # blink rate is measured over this rolling window
+BLINK_WARMUP_SECONDS = 30     # no blink verdict before this much of the stream was seen (~8 blinks at a normal rate)
+MIN_BLINK_FPS = 10.0          # below this many eye samples per second, 100-300 ms blinks fall between frames
+MAX_BLINK_SECONDS = 1.0       # eyes closed longer than this is not a blink
+SCORE_EMA_ALPHA = 0.3         # weight of the newest frame in the face score average
+ROI_MARGIN = 0.5              # tracked face box is searched with this much margin around it
+
+active_sessions = 0
+
+
+class LiveSession:
+    """
+    State of one live-analysis stream: a rolling EAR/blink window, an
+    exponential moving average of the deepfake face score and the tracked
+    face box (re-detected inside a margin around its last position, and in
+    the whole frame only when it is lost).
+    """
+
+    def __init__(self):
+        self.face_detector = get_model_module("face_detector")
+        liveness = get_model_module("liveness_checker")
+        self.ear_threshold = liveness.EAR_THRESHOLD
+        # Face Mesh tracks between frames, so every stream gets its own graph
+        self.tracker = liveness.BlinkTracker(mesh=liveness.create_face_mesh())
+
+        self.started_at = time.time()
+        self.ear_window = deque()      # (timestamp, ear)
+        self.blink_times = deque()
+        self.eyes_closed_since = None
+        self.score_ema = None
+        self.roi: Optional[Tuple[int, int, int, int]] = None
+
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.frames_processed = 0
+
+    def _track_face(self, rgb):
+        """Find the face near its last position, falling back to a full-frame search"""
+        h, w, _ = rgb.shape
+        if self.roi is not None:
+            x1, y1, x2, y2 = self.roi
+            mx, my = int((x2 - x1) * ROI_MARGIN), int((y2 - y1) * ROI_MARGIN)
+            sx1, sy1 = max(0, x1 - mx), max(0, y1 - my)
+            sx2, sy2 = min(w, x2 + mx), min(h, y2 + my)
+            boxes = self.face_detector.detect_face_boxes(rgb[sy1:sy2, sx1:sx2])
+            boxes = [(bx1 + sx1, by1 + sy1, bx2 + sx1, by2 + sy1) for bx1, by1, bx2, by2 in boxes]
+        else:
+            boxes = []
+        if not boxes:
+            boxes = self.face_detector.detect_face_boxes(rgb)
+
+        # Largest face is the speaker
+        self.roi = max(boxes, key=lambda b: (b[2] - b[0]) * (b[3] - b[1])) if boxes else None
+        return self.roi
+
+    def _update_blinks(self, now, ear):
+        if ear is not None:
+            self.ear_window.append((now, ear))
+            if ear < self.ear_threshold:
+                if self.eyes_closed_since is None:
+                    self.eyes_closed_since = now
+            elif self.eyes_closed_since is not None:
+                if now - self.eyes_closed_since <= MAX_BLINK_SECONDS:
+                    self.blink_times.append(now)
+                self.eyes_closed_since = None
+
+        while self.ear_window and self.ear_window[0][0] < now - BLINK_WINDOW_SECONDS:
+            self.ear_window.popleft()
+        while self.blink_times and self.blink_times[0] < now - BLINK_WINDOW_SECONDS:
+            self.blink_times.popleft()
+
+    def process(self, data: bytes):
+        """Analyze one encoded frame and return the updated session verdict (blocking)"""
+        t0 = time.perf_counter()
+        now = time.time()
+        rgb = decode_frame_batch([data])[0]
+
+        ear = self.tracker.process_frame(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+        self._update_blinks(now, ear)
+
+        roi = self._track_face(rgb)
+        face_score = None
+        if roi is not None:
+            x1, y1, x2, y2 = roi
+            face_score = self.face_detector.get_face_scores([rgb[y1:y2, x1:x2]])[0]
+            if self.score_ema is None:
+                self.score_ema = face_score
+            else:
+                self.score_ema = SCORE_EMA_ALPHA * face_score + (1 - SCORE_EMA_ALPHA) * self.score_ema
+
+        self.frames_processed += 1
+        return self.verdict(now, ear, face_score, (time.perf_counter() - t0) * 1000)
+
+    def close(self):
+        self.tracker.mesh.close()
+
+    def verdict(self, now, ear=None, face_score=None, latency_ms=None):
+        elapsed = now - self.started_at
+        window = min(elapsed, BLINK_WINDOW_SECONDS)
+        blink_rate = len(self.blink_times) / window * 60 if window > 0 else 0.0
+
+        # Eye samples per second actually analyzed, not the rate frames were sent at
+        ear_fps = 0.0
+        if len(self.ear_window) > 1:
+            span = self.ear_window[-1][0] - self.ear_window[0][0]
+            ear_fps = (len(self.ear_window) - 1) / span if span > 0 else 0.0
+
+        # Too few samples (the extension sends 2 fps) makes the blink rate advisory only
+        blink_abnormal = None
+        if elapsed >= BLINK_WARMUP_SECONDS and ear_fps >= MIN_BLINK_FPS:
+            # Same bounds as the recorded-video liveness check
+            blink_abnormal = blink_rate < 5 or blink_rate > 60
+
+        fake_prob = (self.score_ema or 0.0) / 100
+        is_fake = fake_prob > 0.5 or bool(blink_abnormal)
+        if fake_prob > 0.8 or (fake_prob > 0.5 and blink_abnormal):
+            threat_level = 'HIGH'
+        elif is_fake:
+            threat_level = 'MEDIUM'
+        elif self.score_ema is None:
+            threat_level = 'UNKNOWN'
+        else:
+            threat_level = 'LOW'
+
+        return {
+            'type': 'verdict',
+            'is_fake': is_fake,
+            'threat_level': threat_level,
+            'confidence': round(fake_prob if fake_prob > 0.5 else 1 - fake_prob, 4),
+            'face_score': round(face_score, 2) if face_score is not None else None,
+            'face_score_ema': round(self.score_ema, 2) if self.score_ema is not None else None,
+            'face_roi': list(self.roi) if self.roi else None,
+            'ear': round(ear, 4) if ear is not None else None,
+            'blinks_in_window': len(self.blink_times),
+            'blink_rate_bpm': round(blink_rate, 2),
+            'blink_abnormal': blink_abnormal,
+            'ear_fps': round(ear_fps, 1),
+            'elapsed_seconds': round(elapsed, 2),
+            'frames_received': self.frames_received,
+            'frames_processed': self.frames_processed,
+            'frames_dropped': self.frames_dropped,
+            'latency_ms': round(latency_ms, 1) if latency_ms is not None else None
+        }
+
+
+@router.websocket("/ws/analyze-live")
+async def live_analysis(websocket: WebSocket):
+    """
+    Live screen-capture analysis. The client sends frames as binary messages
+    (JPEG/PNG) and receives a JSON verdict after every analyzed frame. When
+    frames arrive faster than they can be analyzed, only the newest waiting
+    frame is kept (latest frame wins) and the rest count as dropped.
+    Text message {"type": "reset"} clears the session state.
+    """
+    global active_sessions
+    await websocket.accept()
+    if active_sessions >= MAX_LIVE_SESSIONS:
+        await websocket.close(code=1013, reason="Too many live sessions")
+        return
+
+    active_sessions += 1
+    try:
+        # First session loads the models
+        session = await asyncio.to_thread(LiveSession)
+        latest = {'frame': None, 'reset': False}
+        frame_ready = asyncio.Event()
+
+        async def receive_frames():
+            while True:
+                message = await websocket.receive()
+                if message['type'] == 'websocket.disconnect':
+                    return
+                if message.get('bytes') is not None:
+                    session.frames_received += 1
+                    if latest['frame'] is not None:
+                        session.frames_dropped += 1
+                    latest['frame'] = message['bytes']
+                    frame_ready.set()
+                elif message.get('text'):
+                    try:
+                        command = json.loads(message['text'])
+                    except ValueError:
+                        continue
+                    if isinstance(command, dict) and command.get('type') == 'reset':
+                        # Applied by the processing loop between frames
+                        latest['frame'] = None
+                        latest['reset'] = True
+                        frame_ready.set()
+
+        receiver = asyncio.create_task(receive_frames())
+        try:
+            while True:
+                waiter = asyncio.create_task(frame_ready.wait())
+                await asyncio.wait({waiter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+                if not frame_ready.is_set():
+                    waiter.cancel()
+                    break
+
+                frame_ready.clear()
+                if latest['reset']:
+                    # No frame is being processed here, so the old Face Mesh can be closed
+                    latest['reset'] = False
+                    old, session = session, await asyncio.to_thread(LiveSession)
+                    old.close()
+                frame, latest['frame'] = latest['frame'], None
+                if frame is None:
+                    continue
+                try:
+                    verdict = await asyncio.to_thread(session.process, frame)
+                except Exception as e:
+                    verdict = {'type': 'error', 'detail': str(e)}
+                await websocket.send_json(verdict)
+        finally:
+            receiver.cancel()
+            session.close()
+    except (WebSocketDisconnect, RuntimeError):
+        # Client went away mid-send
+        pass
+    finally:
+        active_sessions -= 1
@@ -0,0 +1,271 @@
+import time
+import uuid
+import random
+import asyncio
+import threading
+import contextlib
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, Optional, Callable, List
+
+from .media_downloader import download_video, DownloadCancelled
+from .url_cache import canonicalize_url
+
+MAX_CONCURRENT_DOWNLOADS = 4
+# Simultaneous downloads per platform (keeps us under the sites' rate limits)
+PLATFORM_LIMITS = {'youtube': 2, 'twitter': 2, 'instagram': 1, 'tiktok': 1}
+DEFAULT_PLATFORM_LIMIT = 1
+MAX_RETRIES = 2            # extra attempts after the first failure
+BACKOFF_SECONDS = 2.0      # first retry delay, doubled on every further retry (with jitter)
+KEEP_FINISHED_JOBS = 200   # finished jobs still visible through the API
+
+# Failures a retry cannot fix
+PERMANENT_ERRORS = ('Unsupported platform', 'Unsupported URL', 'Video unavailable',
+                    'Private video', 'This video is not available', 'Sign in to confirm')
+
+FINISHED = ('completed', 'failed', 'cancelled')
+
+
+def platform_of(url: str) -> str:
+    """'youtube', 'twitter', 'instagram', 'tiktok' or 'url' for anything else"""
+    return canonicalize_url(url).split(':', 1)[0]
+
+
+def is_retryable(error: Optional[str]) -> bool:
+    return not any(marker in (error or '') for marker in PERMANENT_ERRORS)
+
+
+class DownloadJob:
+    """One queued URL download: status, progress and (once finished) the download_video result."""
+
+    def __init__(self, url: str, options: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.url = url
+        self.options = options
+        self.platform = platform_of(url)
+        self.status = 'queued'
+        self.attempts = 0
+        self.progress: Dict[str, Any] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future: Future = Future()
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def on_progress(self, d: Dict[str, Any]):
+        """yt-dlp progress hook; raising here is how a running download gets cancelled"""
+        if self._cancel.is_set():
+            raise DownloadCancelled('Download cancelled')
+        downloaded = d.get('downloaded_bytes') or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        self.progress = {
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'percent': round(100.0 * downloaded / total, 1) if total else None,
+            'speed': d.get('speed'),
+            'eta': d.get('eta')
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'url': self.url,
+            'platform': self.platform,
+            'status': self.status,
+            'attempts': self.attempts,
+            'progress': self.progress,
+            'error': self.error,
+            'video_path': (self.result or {}).get('video_path'),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class DownloadManager:
+    """
+    Bounded download queue. yt-dlp runs in a thread pool, never on the event
+    loop, with at most `max_workers` downloads overall and PLATFORM_LIMITS per
+    platform; jobs over the limit wait in FIFO order without holding a thread.
+    Failed downloads are retried with exponential backoff, and jobs can be
+    cancelled while queued, downloading or waiting for a retry.
+
+    `downloader` has the download_video signature (FakeDownloader for offline use).
+    """
+
+    def __init__(self, downloader: Callable[..., Dict[str, Any]] = download_video,
+                 max_workers: int = MAX_CONCURRENT_DOWNLOADS,
+                 platform_limits: Optional[Dict[str, int]] = None,
+                 max_retries: int = MAX_RETRIES, backoff_seconds: float = BACKOFF_SECONDS):
+        self.downloader = downloader
+        self.max_workers = max_workers
+        self.platform_limits = dict(PLATFORM_LIMITS if platform_limits is None else platform_limits)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='download')
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._jobs: 'OrderedDict[str, DownloadJob]' = OrderedDict()
+        self._queue: deque = deque()
+        self._active: Dict[str, int] = {}
+        self._running = 0
+
+    def limit(self, platform: str) -> int:
+        return self.platform_limits.get(platform, DEFAULT_PLATFORM_LIMIT)
+
+    def _has_capacity(self, platform: str) -> bool:
+        return self._running < self.max_workers and self._active.get(platform, 0) < self.limit(platform)
+
+    def _take_slot(self, platform: str):
+        self._running += 1
+        self._active[platform] = self._active.get(platform, 0) + 1
+
+    def _release_slot(self, platform: str):
+        self._running -= 1
+        self._active[platform] -= 1
+        self._dispatch()
+        self._slot_freed.notify_all()
+
+    # === Jobs ===
+
+    def submit(self, url: str, **options) -> DownloadJob:
+        """Queue a download (options are passed to the downloader). Returns immediately."""
+        job = DownloadJob(url, options)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._dispatch()
+            self._trim()
+        return job
+
+    def _dispatch(self):
+        """Start queued jobs, oldest first, while their platform has a free slot (lock held)"""
+        for job in list(self._queue):
+            if not self._has_capacity(job.platform):
+                continue
+            self._queue.remove(job)
+            self._take_slot(job.platform)
+            job.status = 'starting'
+            self._executor.submit(self._run, job)
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - KEEP_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: DownloadJob):
+        result = None
+        try:
+            job.started_at = time.time()
+            while not job.cancelled:
+                job.attempts += 1
+                job.status = 'downloading'
+                try:
+                    result = self.downloader(job.url, progress_hook=job.on_progress, **job.options)
+                except Exception as e:
+                    result = {'success': False, 'error': str(e)}
+
+                if result.get('success') or job.cancelled:
+                    break
+                job.error = result.get('error')
+                if job.attempts > self.max_retries or not is_retryable(job.error):
+                    break
+
+                delay = self.backoff_seconds * 2 ** (job.attempts - 1) * random.uniform(0.75, 1.25)
+                job.status = 'retrying'
+                print(f"🔁 Retrying {job.url} in {delay:.1f}s (attempt {job.attempts} failed: {job.error})")
+                if job._cancel.wait(delay):
+                    break
+        finally:
+            if result and result.get('success'):
+                self._finish(job, 'completed', result)
+            elif job.cancelled:
+                self._finish(job, 'cancelled', {'success': False, 'error': 'Download cancelled', 'cancelled': True})
+            else:
+                self._finish(job, 'failed', result or {'success': False, 'error': 'Download failed'})
+            with self._lock:
+                self._release_slot(job.platform)
+
+    def _finish(self, job: DownloadJob, status: str, result: Dict[str, Any]):
+        job.result = result
+        job.error = None if result.get('success') else result.get('error')
+        job.status = status
+        job.finished_at = time.time()
+        if not job.future.done():
+            job.future.set_result(result)
+
+    def cancel(self, job_id: str) -> Optional[DownloadJob]:
+        """Cancel a job. Queued jobs finish right away, running ones at their next progress update."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job._cancel.set()
+            if job in self._queue:
+                self._queue.remove(job)
+                self._finish(job, 'cancelled', {'success': False, 'error': 'Download cancelled', 'cancelled': True})
+        return job
+
+    def get(self, job_id: str) -> Optional[DownloadJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest jobs first"""
+        with self._lock:
+            return [job.to_dict() for job in list(reversed(self._jobs.values()))[:limit]]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'running': self._running,
+                'queued': len(self._queue),
+                'max_workers': self.max_workers,
+                'active_by_platform': {p: n for p, n in self._active.items() if n},
+                'platform_limits': self.platform_limits
+            }
+
+    async def download(self, url: str, **options) -> Dict[str, Any]:
+        """Queue a download and await its download_video-style result without blocking the event loop"""
+        job = self.submit(url, **options)
+        try:
+            return await asyncio.shield(asyncio.wrap_future(job.future))
+        except asyncio.CancelledError:
+            # Caller went away (e.g. client disconnected)
+            self.cancel(job.id)
+            raise
+
+    @contextlib.contextmanager
+    def slot(self, url: str, cancel_event: Optional[threading.Event] = None):
+        """
+        Hold one of the URL's platform slots for a download run outside the queue
+        (e.g. StreamingDownload). Blocks until a slot is free; raises DownloadCancelled
+        if `cancel_event` is set first.
+        """
+        platform = platform_of(url)
+        with self._lock:
+            while not self._has_capacity(platform):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise DownloadCancelled('Download cancelled')
+                self._slot_freed.wait(0.5)
+            self._take_slot(platform)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._release_slot(platform)
+
+    def shutdown(self):
+        """Cancel everything and stop the workers"""
+        for job_id in list(self._jobs):
+            self.cancel(job_id)
+        self._executor.shutdown(wait=False)
+
+
+download_manager = DownloadManager()
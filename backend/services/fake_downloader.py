@@ -0,0 +1,89 @@
+import os
+import time
+import uuid
+import threading
+from typing import Dict, Any, Optional, Callable
+
+
+class FakeDownloader:
+    """
+    Offline stand-in for download_video (same arguments, same result dict).
+
+    "Downloads" a local sample file - or `size` random bytes - into temp/videos
+    in chunks, calling the progress hook the way yt-dlp does, so the
+    DownloadManager can be exercised without network access. The first
+    `fail_times` attempts per URL fail with `error`, for testing retries.
+    """
+
+    def __init__(self, sample_path: Optional[str] = None, size: int = 2 * 1024 * 1024,
+                 chunk_size: int = 256 * 1024, chunk_delay: float = 0.05,
+                 fail_times: int = 0, error: str = 'HTTP Error 503: Service Unavailable'):
+        self.sample_path = sample_path
+        self.size = size
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.fail_times = fail_times
+        self.error = error
+
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.active = 0
+        self.max_active = 0    # highest number of simultaneous downloads seen
+
+    def __call__(self, url: str, max_duration: int = 30, start_time: float = 0,
+                 analysis: str = 'video', max_height: Optional[int] = None,
+                 progress_hook: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        with self._lock:
+            self.calls[url] = self.calls.get(url, 0) + 1
+            attempt = self.calls[url]
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+        output_dir = "temp/videos"
+        os.makedirs(output_dir, exist_ok=True)
+        video_path = os.path.join(output_dir, f"{str(uuid.uuid4())[:8]}.mp4")
+        try:
+            if attempt <= self.fail_times:
+                time.sleep(self.chunk_delay)
+                return {'success': False, 'error': self.error}
+
+            if self.sample_path:
+                with open(self.sample_path, 'rb') as f:
+                    data = f.read()
+            else:
+                data = os.urandom(self.size)
+
+            with open(video_path, 'wb') as f:
+                for offset in range(0, len(data), self.chunk_size):
+                    f.write(data[offset:offset + self.chunk_size])
+                    if progress_hook:
+                        progress_hook({
+                            'status': 'downloading',
+                            'filename': video_path,
+                            'downloaded_bytes': min(offset + self.chunk_size, len(data)),
+                            'total_bytes': len(data)
+                        })
+                    time.sleep(self.chunk_delay)
+
+            return {
+                'success': True,
+                'video_path': video_path,
+                'metadata': {
+                    'title': f'Fake video {attempt}',
+                    'uploader': 'FakeDownloader',
+                    'duration': max_duration or 0,
+                    'platform': 'fake',
+                    'file_size_mb': round(len(data) / (1024 * 1024), 2),
+                    'clip_start': start_time if max_duration else 0,
+                    'clip_seconds': max_duration or 0,
+                    'height': max_height
+                }
+            }
+        except Exception as e:
+            # Same contract as download_video: errors (including cancellation) are returned
+            if os.path.exists(video_path):
+                os.remove(video_path)
+            return {'success': False, 'error': str(e)}
+        finally:
+            with self._lock:
+                self.active -= 1
@@ -0,0 +1,75 @@
+import threading
+from typing import Dict, Any, List, Tuple
+
+import cv2
+import numpy as np
+
+THUMB_SIZE = 32          # frames are compared as 32x32 grayscale thumbnails
+PIXEL_TOLERANCE = 8      # thumbnail pixels differing by more than this (0-255) count as changed
+MAX_CHANGED_PIXELS = 2   # frames with at most this many changed thumbnail pixels are the same frame
+
+
+def frame_thumbnail(frame_rgb: np.ndarray) -> np.ndarray:
+    """Tiny grayscale thumbnail used as a perceptual fingerprint of a frame"""
+    gray = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2GRAY)
+    return cv2.resize(gray, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def thumbnail_diff(a: np.ndarray, b: np.ndarray) -> int:
+    """Number of thumbnail pixels that changed (compression noise stays under the tolerance)"""
+    return int(np.count_nonzero(np.abs(a - b) > PIXEL_TOLERANCE))
+
+
+class FrameDeduplicator:
+    """
+    Skips inference for frames that look the same as one already analyzed
+    (paused or slow-moving video in a screen capture). Each frame is compared
+    with the previous frame, then with the other frames analyzed in its batch.
+    Nothing is remembered between requests: the instance is shared by every
+    client, and one client's frames must never decide another's scores.
+    Keeps running counters so the skip ratio shows the compute saved.
+    """
+
+    def __init__(self, max_diff: int = MAX_CHANGED_PIXELS):
+        self.max_diff = max_diff
+        self._lock = threading.Lock()
+        self.frames_seen = 0
+        self.frames_skipped = 0
+
+    def plan(self, frames: np.ndarray) -> Tuple[List[int], List[int]]:
+        """
+        Decide which frames of an (N, H, W, 3) batch need inference.
+        Returns (indices to analyze, per-frame source), where each source is
+        the position in the analyzed list whose result the frame takes.
+        """
+        thumbs = [frame_thumbnail(frame) for frame in frames]
+        analyze = []
+        sources = []
+        analyzed = []       # (thumbnail, source) of the frames picked for inference
+        reference = None    # (thumbnail, source) of the previous frame
+        for index, thumb in enumerate(thumbs):
+            if reference is not None and thumbnail_diff(thumb, reference[0]) <= self.max_diff:
+                sources.append(reference[1])
+                continue
+            # Back to a frame seen earlier in this batch?
+            source = next((src for seen_thumb, src in reversed(analyzed)
+                           if thumbnail_diff(thumb, seen_thumb) <= self.max_diff), None)
+            if source is None:
+                source = len(analyze)
+                analyze.append(index)
+                analyzed.append((thumb, source))
+            sources.append(source)
+            reference = (thumb, source)
+
+        with self._lock:
+            self.frames_seen += len(frames)
+            self.frames_skipped += len(frames) - len(analyze)
+        return analyze, sources
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'frames_seen': self.frames_seen,
+                'frames_skipped': self.frames_skipped,
+                'skip_ratio': round(self.frames_skipped / self.frames_seen, 4) if self.frames_seen else 0.0
+            }
@@ -1,16 +1,56 @@
 import yt_dlp
+from yt_dlp.utils import download_range_func
+import io
+import contextlib
 import os
 import uuid
-from typing import Dict, Any
+import hashlib
+import threading
+from typing import Dict, Any, Optional, Callable
 
+# Lowest resolution each analysis still works at (None = audio only is enough)
+ANALYSIS_MAX_HEIGHT = {
+    'blink': 360,     # EAR landmarks only need a face of ~100px
+    'video': 360,     # blink/liveness + audio track
+    'audio': None,
+    'full': 720,      # frame-level visual models
+}
 
-def download_video(url: str, max_duration: int = 30) -> Dict[str, Any]:
+
+def build_format(analysis: str = 'video', max_height: Optional[int] = None) -> str:
+    """yt-dlp format selector for the cheapest streams an analysis can use."""
+    height = max_height if max_height is not None else ANALYSIS_MAX_HEIGHT.get(analysis, 720)
+    if height is None:
+        return 'bestaudio/best'
+    # Best stream at or below the cap, else the smallest one available
+    return (f'bestvideo[height<={height}]+bestaudio/best[height<={height}]'
+            f'/worstvideo+bestaudio/worst')
+
+
+def build_stream_format(analysis: str = 'video', max_height: Optional[int] = None) -> str:
+    """Single-file (progressive) format, so the file can be read while it downloads."""
+    height = max_height if max_height is not None else ANALYSIS_MAX_HEIGHT.get(analysis, 720)
+    if height is None:
+        return 'bestaudio/best'
+    return f'best[height<={height}][ext=mp4]/best[height<={height}]/worst[ext=mp4]/worst'
+
+
+def download_video(url: str, max_duration: int = 30, start_time: float = 0,
+                   analysis: str = 'video', max_height: Optional[int] = None,
+                   progress_hook: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
     """
     Download video from URL using yt-dlp.
     
+    Only the [start_time, start_time + max_duration] window is fetched (yt-dlp
+    section download), at the lowest resolution the requested analysis needs.
+    
     Args:
         url: Video URL (YouTube, Twitter, Instagram, TikTok)
-        max_duration: Max seconds to download
+        max_duration: Max seconds to download (None or 0 = whole video)
+        start_time: Where the clip window starts, in seconds
+        analysis: 'blink', 'video', 'audio' or 'full' - picks the resolution cap
+        max_height: Explicit resolution cap, overrides `analysis`
+        progress_hook: yt-dlp progress hook; raising from it aborts the download
         
     Returns:
         {
@@ -43,22 +83,31 @@ def download_video(url: str, max_duration: int = 30) -> Dict[str, Any]:
     
     # yt-dlp options
     ydl_opts = {
-        'format': 'bestvideo[height<=720]+bestaudio/best[height<=720]/best',
+        'format': build_format(analysis, max_height),
         'outtmpl': output_template,
         'merge_output_format': 'mp4',
         'quiet': True,
         'no_warnings': True,
     }
+    if progress_hook:
+        ydl_opts['progress_hooks'] = [progress_hook]
+    
+    # Fetch only the clip window instead of the whole (possibly hours-long) video
+    if max_duration:
+        ydl_opts['download_ranges'] = download_range_func(None, [(start_time, start_time + max_duration)])
+        ydl_opts['force_keyframes_at_cuts'] = False  # cut on keyframes, no re-encode
     
     try:
         print(f"⏬ Downloading from: {url}")
         
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             info = ydl.extract_info(url, download=True)
-            video_path = ydl.prepare_filename(info)
+            # Final path after merging (audio-only downloads keep their own extension)
+            downloads = info.get('requested_downloads') or [{}]
+            video_path = downloads[0].get('filepath') or ydl.prepare_filename(info)
             
             # Ensure .mp4 extension
-            if not video_path.endswith('.mp4'):
+            if not os.path.exists(video_path) and not video_path.endswith('.mp4'):
                 base = os.path.splitext(video_path)[0]
                 video_path = base + '.mp4'
             
@@ -83,7 +132,10 @@ def download_video(url: str, max_duration: int = 30) -> Dict[str, Any]:
                     'uploader': info.get('uploader', 'Unknown'),
                     'duration': info.get('duration', 0),
                     'platform': info.get('extractor', 'Unknown'),
-                    'file_size_mb': round(file_size_mb, 2)
+                    'file_size_mb': round(file_size_mb, 2),
+                    'clip_start': start_time if max_duration else 0,
+                    'clip_seconds': min(max_duration, info.get('duration') or max_duration) if max_duration else info.get('duration', 0),
+                    'height': info.get('height')
                 }
             }
             
@@ -95,3 +147,171 @@ def download_video(url: str, max_duration: int = 30) -> Dict[str, Any]:
             'success': False,
             'error': error_msg
         }
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+class GrowingFile(io.RawIOBase):
+    """
+    Read-only, non-seekable view of a file that is still being written.
+    At the current end of the file, reads wait for more data until the
+    download is finished, so a demuxer can consume the media as it arrives.
+    """
+
+    POLL_SECONDS = 0.05
+
+    def __init__(self, download: 'StreamingDownload'):
+        self.download = download
+        self._file = None
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def _open(self):
+        while self._file is None:
+            path = self.download.path
+            if path and os.path.exists(path):
+                self._file = open(path, 'rb')
+            elif self.download.done.is_set():
+                raise IOError(self.download.error or 'Download produced no file')
+            else:
+                self.download.started.wait(self.POLL_SECONDS)
+
+    def readinto(self, buffer):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        self._open()
+        while True:
+            # Check `done` before reading so the last bytes written are never missed
+            finished = self.download.done.is_set()
+            n = self._file.readinto(buffer)
+            if n:
+                self.bytes_read += n
+                return n
+            if finished:
+                return 0
+            self.download.done.wait(self.POLL_SECONDS)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        super().close()
+
+
+class StreamingDownload:
+    """
+    yt-dlp download running in a background thread, readable while it runs.
+    
+    The file is written in place (no .part rename) in a single-file format, so
+    `reader()` can hand it to MediaDemuxer before the download has finished.
+    `cancel()` stops the download, e.g. once enough of the video was analyzed.
+    """
+
+    def __init__(self, url: str, analysis: str = 'video', max_height: Optional[int] = None, manager=None):
+        self.url = url
+        self.manager = manager    # DownloadManager whose per-platform limit this download counts against
+        self.path = None
+        self.info = None
+        self.error = None
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self._cancel = threading.Event()
+
+        video_id = str(uuid.uuid4())[:8]
+        output_dir = "temp/videos"
+        os.makedirs(output_dir, exist_ok=True)
+        self._opts = {
+            'format': build_stream_format(analysis, max_height),
+            'outtmpl': os.path.join(output_dir, f"{video_id}.%(ext)s"),
+            'nopart': True,
+            'quiet': True,
+            'no_warnings': True,
+            'progress_hooks': [self._on_progress],
+        }
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> 'StreamingDownload':
+        print(f"⏬ Streaming download from: {self.url}")
+        self._thread.start()
+        return self
+
+    def _on_progress(self, d):
+        if self._cancel.is_set():
+            raise DownloadCancelled('cancelled')
+        if self.path is None and d.get('filename'):
+            self.path = d.get('tmpfilename') or d['filename']
+            self.info = d.get('info_dict')
+            self.started.set()
+
+    def _run(self):
+        try:
+            slot = self.manager.slot(self.url, self._cancel) if self.manager else contextlib.nullcontext()
+            with slot:
+                with yt_dlp.YoutubeDL(self._opts) as ydl:
+                    self.info = ydl.extract_info(self.url, download=True)
+                    downloads = self.info.get('requested_downloads') or [{}]
+                    self.path = downloads[0].get('filepath') or self.path or ydl.prepare_filename(self.info)
+        except Exception as e:
+            if not self._cancel.is_set():
+                self.error = str(e)
+                print(f"❌ Download failed: {self.error}")
+        finally:
+            self.started.set()
+            self.done.set()
+
+    def reader(self) -> GrowingFile:
+        return GrowingFile(self)
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.done.wait(timeout)
+
+    def content_hash(self, prefix_bytes: int) -> Optional[str]:
+        """
+        SHA-256 of the first `prefix_bytes` of the file (all of it if shorter),
+        waiting for the download to get that far. The prefix does not depend on
+        when the download was cancelled, so it is a stable key for the history.
+        """
+        while not self.done.is_set():
+            if self.path and os.path.exists(self.path) and os.path.getsize(self.path) >= prefix_bytes:
+                break
+            self.done.wait(GrowingFile.POLL_SECONDS)
+        if not self.path or not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as f:
+            return hashlib.sha256(f.read(prefix_bytes)).hexdigest()
+
+    def metadata(self) -> Dict[str, Any]:
+        info = self.info or {}
+        return {
+            'title': info.get('title', 'Unknown'),
+            'uploader': info.get('uploader', 'Unknown'),
+            'duration': info.get('duration', 0),
+            'platform': info.get('extractor', 'Unknown'),
+            'height': info.get('height')
+        }
+
+    def cleanup(self):
+        """Cancel if still running and delete the downloaded file"""
+        self.cancel()
+        self._thread.join(timeout=10)
+        if self.path and os.path.exists(self.path):
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                print(f"⚠️ Could not delete {self.path}: {e}")
+
+
+def stream_download(url: str, analysis: str = 'video', max_height: Optional[int] = None,
+                    manager=None) -> StreamingDownload:
+    """Start downloading `url` in the background; read it with `.reader()` as it arrives."""
+    return StreamingDownload(url, analysis=analysis, max_height=max_height, manager=manager).start()
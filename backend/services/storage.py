@@ -1,107 +1,491 @@
 import sqlite3
 import os
+import json
+import base64
+import time
+import queue
+import atexit
+import asyncio
+import threading
 from datetime import datetime
 from pathlib import Path
 
 DB_PATH = "storage/deepfake_shield.db"
 
+# Per-connection tuning: WAL lets readers run alongside the writer, NORMAL sync
+# is still crash-safe in WAL mode, and the cache/mmap keep hot pages in memory
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-32000",      # ~32 MB
+    "PRAGMA mmap_size=268435456",    # 256 MB
+    "PRAGMA busy_timeout=5000",
+)
+
+VIDEO_COLUMNS = (
+    "id", "url", "platform", "file_path", "title", "duration",
+    "file_size", "downloaded_at", "analysis_status", "threat_level"
+)
+ANALYSIS_COLUMNS = (
+    "id", "video_id", "confidence", "threat_type", "visual_score",
+    "audio_score", "temporal_score", "lipsync_score", "analyzed_at"
+)
+MAX_PAGE_SIZE = 500
+
+_local = threading.local()
+
+
+def get_connection():
+    """
+    Connection for the calling thread (opened once, then reused).
+    SQLite connections must not be shared across threads, so the pool is per-thread.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=5.0)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        _local.conn = conn
+    return conn
+
+
+def close_connection():
+    """Close the calling thread's connection (e.g. on shutdown)"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
 def init_db():
     """Initialize SQLite database for storing video metadata."""
     os.makedirs("storage", exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS videos (
-            id TEXT PRIMARY KEY,
-            url TEXT NOT NULL,
-            platform TEXT,
-            file_path TEXT,
-            title TEXT,
-            duration INTEGER,
-            file_size INTEGER,
-            downloaded_at TIMESTAMP,
-            analysis_status TEXT,
-            threat_level TEXT
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS analyses (
-            id TEXT PRIMARY KEY,
-            video_id TEXT,
-            confidence REAL,
-            threat_type TEXT,
-            visual_score REAL,
-            audio_score REAL,
-            temporal_score REAL,
-            lipsync_score REAL,
-            analyzed_at TIMESTAMP,
-            FOREIGN KEY (video_id) REFERENCES videos(id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-def save_video_metadata(video_id: str, url: str, platform: str, file_path: str, 
+    conn = get_connection()
+
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS videos (
+                id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                platform TEXT,
+                file_path TEXT,
+                title TEXT,
+                duration INTEGER,
+                file_size INTEGER,
+                downloaded_at TIMESTAMP,
+                analysis_status TEXT,
+                threat_level TEXT
+            )
+        ''')
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS analyses (
+                id TEXT PRIMARY KEY,
+                video_id TEXT,
+                confidence REAL,
+                threat_type TEXT,
+                visual_score REAL,
+                audio_score REAL,
+                temporal_score REAL,
+                lipsync_score REAL,
+                analyzed_at TIMESTAMP,
+                FOREIGN KEY (video_id) REFERENCES videos(id)
+            )
+        ''')
+
+        # Listing order is (downloaded_at, id) DESC; every filter gets a matching
+        # composite index so a page is a single index range scan
+        conn.execute('DROP INDEX IF EXISTS idx_videos_downloaded_at')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_videos_recent ON videos(downloaded_at, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_videos_platform_recent ON videos(platform, downloaded_at, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_videos_status_recent ON videos(analysis_status, downloaded_at, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_videos_threat_recent ON videos(threat_level, downloaded_at, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_videos_url ON videos(url)')
+        conn.execute('DROP INDEX IF EXISTS idx_analyses_video_id')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_analyses_video_recent ON analyses(video_id, analyzed_at, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_analyses_recent ON analyses(analyzed_at, id)')
+
+def save_video_metadata(video_id: str, url: str, platform: str, file_path: str,
                        title: str, duration: int, file_size: int):
     """Save video metadata to database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO videos 
-        (id, url, platform, file_path, title, duration, file_size, downloaded_at, analysis_status)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (video_id, url, platform, file_path, title, duration, file_size, datetime.now(), 'pending'))
-    
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+
+    with conn:
+        conn.execute('''
+            INSERT INTO videos
+            (id, url, platform, file_path, title, duration, file_size, downloaded_at, analysis_status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (video_id, url, platform, file_path, title, duration, file_size, datetime.now(), 'pending'))
 
 def get_video(video_id: str):
     """Get video metadata from database."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM videos WHERE id = ?', (video_id,))
-    result = cursor.fetchone()
-    conn.close()
-    
+    conn = get_connection()
+
+    result = conn.execute('SELECT * FROM videos WHERE id = ?', (video_id,)).fetchone()
+
     return dict(result) if result else None
 
 def list_videos():
     """List all stored videos."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM videos ORDER BY downloaded_at DESC')
-    results = cursor.fetchall()
-    conn.close()
-    
+    conn = get_connection()
+
+    results = conn.execute('SELECT * FROM videos ORDER BY downloaded_at DESC').fetchall()
+
     return [dict(row) for row in results]
 
+def encode_cursor(sort_value, row_id):
+    """Opaque keyset cursor for the last row of a page"""
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, row_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _project(columns, allowed, required):
+    """Validate a column projection; always keep the columns the cursor needs"""
+    if not columns:
+        return list(allowed)
+    unknown = set(columns) - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+    return list(dict.fromkeys(list(required) + list(columns)))
+
+def list_videos_page(limit: int = 50, cursor: str = None, columns=None, platform: str = None,
+                     analysis_status: str = None, threat_level: str = None,
+                     include_latest_analysis: bool = False):
+    """
+    One page of videos, newest first, using keyset pagination on (downloaded_at, id).
+    Returns {"videos": [...], "next_cursor": str or None}.
+    With include_latest_analysis each video carries its most recent analyses row,
+    fetched in the same query.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    selected = _project(columns, VIDEO_COLUMNS, ("id", "downloaded_at"))
+
+    where = []
+    params = []
+    for column, value in (("platform", platform), ("analysis_status", analysis_status),
+                          ("threat_level", threat_level)):
+        if value is not None:
+            where.append(f"v.{column} = ?")
+            params.append(value)
+    if cursor:
+        where.append("(v.downloaded_at, v.id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+
+    query = "SELECT " + ", ".join(f"v.{c}" for c in selected)
+    if include_latest_analysis:
+        query += ", " + ", ".join(f"a.{c} AS analysis_{c}" for c in ANALYSIS_COLUMNS)
+    query += " FROM videos v"
+    if include_latest_analysis:
+        query += '''
+            LEFT JOIN analyses a ON a.id = (
+                SELECT id FROM analyses WHERE video_id = v.id
+                ORDER BY analyzed_at DESC, id DESC LIMIT 1
+            )'''
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY v.downloaded_at DESC, v.id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    rows = get_connection().execute(query, params).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    videos = []
+    for row in rows:
+        video = {c: row[c] for c in selected}
+        if include_latest_analysis:
+            analysis = {c: row[f"analysis_{c}"] for c in ANALYSIS_COLUMNS}
+            video["latest_analysis"] = analysis if analysis["id"] is not None else None
+        videos.append(video)
+
+    next_cursor = encode_cursor(rows[-1]["downloaded_at"], rows[-1]["id"]) if has_more else None
+    return {"videos": videos, "next_cursor": next_cursor}
+
+def list_analyses_page(limit: int = 50, cursor: str = None, video_id: str = None,
+                       threat_type: str = None):
+    """One page of analyses, newest first (keyset on (analyzed_at, id))."""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    where = []
+    params = []
+    if video_id is not None:
+        where.append("video_id = ?")
+        params.append(video_id)
+    if threat_type is not None:
+        where.append("threat_type = ?")
+        params.append(threat_type)
+    if cursor:
+        where.append("(analyzed_at, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+
+    query = f"SELECT {', '.join(ANALYSIS_COLUMNS)} FROM analyses"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY analyzed_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    rows = get_connection().execute(query, params).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = encode_cursor(rows[-1]["analyzed_at"], rows[-1]["id"]) if has_more else None
+    return {"analyses": [dict(row) for row in rows], "next_cursor": next_cursor}
+
+INSERT_ANALYSIS_SQL = '''
+    INSERT INTO analyses
+    (id, video_id, confidence, threat_type, visual_score, audio_score, temporal_score, lipsync_score, analyzed_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+UPDATE_STATUS_SQL = 'UPDATE videos SET analysis_status = ?, threat_level = COALESCE(?, threat_level) WHERE id = ?'
+
 def update_analysis(video_id: str, analysis_id: str, confidence: float, threat_type: str,
                    visual: float, audio: float, temporal: float, lipsync: float):
     """Save analysis results to database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Save analysis
-    cursor.execute('''
-        INSERT INTO analyses 
-        (id, video_id, confidence, threat_type, visual_score, audio_score, temporal_score, lipsync_score, analyzed_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (analysis_id, video_id, confidence, threat_type, visual, audio, temporal, lipsync, datetime.now()))
-    
-    # Update video status
-    cursor.execute('UPDATE videos SET analysis_status = ?, threat_level = ? WHERE id = ?',
-                  ('completed', threat_type, video_id))
-    
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+
+    with conn:
+        # Save analysis
+        conn.execute(INSERT_ANALYSIS_SQL, (analysis_id, video_id, confidence, threat_type,
+                                           visual, audio, temporal, lipsync, datetime.now()))
+
+        # Update video status
+        conn.execute(UPDATE_STATUS_SQL, ('completed', threat_type, video_id))
+
+# --- WRITE-BEHIND PERSISTENCE ---
+
+WRITE_BATCH_SIZE = 200          # Flush once this many writes are queued...
+WRITE_FLUSH_INTERVAL = 0.5      # ...or after this many seconds, whichever comes first
+PENDING_WRITES_PATH = "storage/pending_writes.jsonl"
+DEAD_WRITES_PATH = "storage/dead_writes.jsonl"    # rows the database rejected (constraint errors); never replayed
+
+
+class WriteBehindWriter:
+    """
+    Collects analysis and video-status writes on a queue and commits them from
+    a background thread in batched transactions, so bulk ingestion pays for one
+    commit per batch instead of one per analysis.
+
+    If a batch fails, its rows are retried one by one so one bad row does not
+    take the rest down. Rows the database rejects (constraint errors) go to
+    DEAD_WRITES_PATH; rows that could not be written for any other reason
+    (database unavailable, or still queued when the process stops) are
+    appended to PENDING_WRITES_PATH and replayed on the next start-up.
+    """
+
+    def __init__(self, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL,
+                 fallback_path=PENDING_WRITES_PATH, dead_letter_path=DEAD_WRITES_PATH):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fallback_path = fallback_path
+        self.dead_letter_path = dead_letter_path
+        self._fallback_lock = threading.RLock()
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "flushes": 0,
+            "rows_written": 0,
+            "last_batch_size": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+            "fallback_writes": 0,
+            "dead_writes": 0
+        }
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="storage-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, op, params):
+        """Queue one write: op is "analysis" or "status", params its SQL parameters"""
+        self.start()
+        self._queue.put((op, params))
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+
+    def _collect(self):
+        """Block until a batch is full or the flush interval has passed"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch):
+        """
+        Commit a batch in one transaction, falling back to one transaction per
+        row if that fails. Returns (retryable rows, rejected rows).
+        """
+        try:
+            conn = get_connection()
+            with conn:
+                for op, params in batch:
+                    conn.execute(INSERT_ANALYSIS_SQL if op == "analysis" else UPDATE_STATUS_SQL, params)
+            return [], []
+        except Exception as e:
+            print(f"⚠️ Batched write failed ({e}) - retrying {len(batch)} writes one by one")
+
+        retryable, rejected = [], []
+        for op, params in batch:
+            try:
+                conn = get_connection()
+                with conn:
+                    conn.execute(INSERT_ANALYSIS_SQL if op == "analysis" else UPDATE_STATUS_SQL, params)
+            except sqlite3.IntegrityError:
+                rejected.append((op, params))
+            except Exception:
+                retryable.append((op, params))
+        return retryable, rejected
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        retryable, rejected = self._commit(batch)
+        if retryable:
+            print(f"⚠️ Saving {len(retryable)} writes to {self.fallback_path}")
+            with self._fallback_lock:
+                self._append_writes(self.fallback_path, retryable)
+        if rejected:
+            print(f"⚠️ Database rejected {len(rejected)} writes - saved to {self.dead_letter_path}")
+            self._append_writes(self.dead_letter_path, rejected)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._stats["flushes"] += 1
+            self._stats["rows_written"] += len(batch) - len(retryable) - len(rejected)
+            self._stats["fallback_writes"] += len(retryable)
+            self._stats["dead_writes"] += len(rejected)
+            self._stats["last_batch_size"] = len(batch)
+            self._stats["last_flush_ms"] = round(elapsed_ms, 3)
+            self._stats["max_flush_ms"] = round(max(self._stats["max_flush_ms"], elapsed_ms), 3)
+            self._stats["total_flush_ms"] += elapsed_ms
+
+    @staticmethod
+    def _append_writes(path, writes):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a") as f:
+            for op, params in writes:
+                f.write(json.dumps([op, list(params)]) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def stop(self, timeout=5.0):
+        """Stop the writer and commit whatever is still queued (or save it to the fallback file)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        remaining = self._drain()
+        if remaining:
+            self._flush(remaining)
+
+    def replay_pending(self):
+        """
+        Apply writes left in the fallback file by an earlier run. The file is
+        only rewritten (with whatever still could not be written) after the
+        replay committed, so a crash halfway replays it again next time.
+        """
+        with self._fallback_lock:
+            if not os.path.exists(self.fallback_path):
+                return 0
+            with open(self.fallback_path) as f:
+                batch = [tuple(json.loads(line)) for line in f if line.strip()]
+            retryable = []
+            if batch:
+                print(f"   📥 Replaying {len(batch)} pending storage writes")
+                retryable, rejected = self._commit(batch)
+                if rejected:
+                    # Typically analyses already committed by a replay that crashed before cleanup
+                    print(f"   ⚠️ Database rejected {len(rejected)} replayed writes - saved to {self.dead_letter_path}")
+                    self._append_writes(self.dead_letter_path, rejected)
+
+            if retryable:
+                tmp_path = self.fallback_path + ".tmp"
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                self._append_writes(tmp_path, retryable)
+                os.replace(tmp_path, self.fallback_path)
+            else:
+                os.remove(self.fallback_path)
+            return len(batch) - len(retryable)
+
+    def metrics(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total_ms = stats.pop("total_flush_ms")
+        stats["avg_flush_ms"] = round(total_ms / stats["flushes"], 3) if stats["flushes"] else 0.0
+        stats["queue_depth"] = self._queue.qsize()
+        stats["running"] = self._thread is not None and self._thread.is_alive()
+        return stats
+
+
+writer = WriteBehindWriter()
+atexit.register(writer.stop)
+
+def queue_analysis(video_id: str, analysis_id: str, confidence: float, threat_type: str,
+                   visual: float, audio: float, temporal: float, lipsync: float):
+    """Write-behind version of update_analysis (returns immediately)."""
+    writer.submit("analysis", (analysis_id, video_id, confidence, threat_type,
+                               visual, audio, temporal, lipsync, str(datetime.now())))
+    writer.submit("status", ('completed', threat_type, video_id))
+
+def queue_video_status(video_id: str, analysis_status: str, threat_level: str = None):
+    """Write-behind update of a video's analysis status (threat_level kept if None)."""
+    writer.submit("status", (analysis_status, threat_level, video_id))
+
+def get_writer_metrics():
+    """Queue depth and flush latency of the write-behind writer"""
+    return writer.metrics()
+
+# --- ASYNC WRAPPERS (run the query in a worker thread, off the event loop) ---
+
+async def save_video_metadata_async(*args, **kwargs):
+    return await asyncio.to_thread(save_video_metadata, *args, **kwargs)
+
+async def get_video_async(video_id: str):
+    return await asyncio.to_thread(get_video, video_id)
+
+async def list_videos_async():
+    return await asyncio.to_thread(list_videos)
+
+async def list_videos_page_async(**kwargs):
+    return await asyncio.to_thread(list_videos_page, **kwargs)
+
+async def list_analyses_page_async(**kwargs):
+    return await asyncio.to_thread(list_analyses_page, **kwargs)
+
+async def update_analysis_async(*args, **kwargs):
+    return await asyncio.to_thread(update_analysis, *args, **kwargs)
 
 # Initialize DB on import
 init_db()
+writer.replay_pending()
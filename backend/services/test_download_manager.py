@@ -0,0 +1,20 @@
+from services.download_manager import DownloadManager
+from services.fake_downloader import FakeDownloader
+
+# Runs offline: FakeDownloader stands in for yt-dlp (from backend/: python -m services.test_download_manager)
+fake = FakeDownloader(size=512 * 1024, chunk_size=64 * 1024, fail_times=1)
+manager = DownloadManager(downloader=fake, platform_limits={'youtube': 2}, backoff_seconds=0.2)
+
+urls = [f"https://www.youtube.com/watch?v=video{i:06d}" for i in range(5)]
+
+print("Testing download manager...")
+jobs = [manager.submit(url) for url in urls]
+manager.cancel(jobs[-1].id)
+
+for job in jobs:
+    result = job.future.result(timeout=60)
+    print(f"{job.id}: {job.status} after {job.attempts} attempt(s) - {result.get('video_path') or result.get('error')}")
+
+print(f"Max simultaneous YouTube downloads: {fake.max_active} (limit 2)")
+print(manager.stats())
+manager.shutdown()
@@ -0,0 +1,164 @@
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Optional, Dict, Any
+from urllib.parse import urlparse, parse_qs, urlencode
+
+DEFAULT_TTL = 24 * 3600   # seconds a URL -> content mapping is trusted
+
+# Query parameters that never change which video a URL points to
+TRACKING_PARAMS = {'si', 'feature', 'utm_source', 'utm_medium', 'utm_campaign',
+                   'utm_term', 'utm_content', 'igshid', 'is_from_webapp', 'sender_device'}
+
+_YOUTUBE_PATH = re.compile(r'^/(?:shorts|embed|live|v)/([A-Za-z0-9_-]{11})')
+_TWITTER_PATH = re.compile(r'^/[^/]+/status(?:es)?/(\d+)')
+_INSTAGRAM_PATH = re.compile(r'^/(?:[^/]+/)?(?:p|reel|reels|tv)/([A-Za-z0-9_-]+)')
+_TIKTOK_PATH = re.compile(r'/video/(\d+)')
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Stable key for the video a URL points to, e.g. 'youtube:dQw4w9WgXcQ'.
+    Different share links, mirrors and tracking parameters map to the same key.
+    Unknown sites fall back to the URL without fragment and tracking parameters.
+    """
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower().split(':')[0]
+    if host.startswith('www.') or host.startswith('m.'):
+        host = host.split('.', 1)[1]
+    path = parsed.path.rstrip('/') or '/'
+
+    if host in ('youtube.com', 'music.youtube.com', 'youtube-nocookie.com'):
+        video_id = parse_qs(parsed.query).get('v', [None])[0]
+        match = _YOUTUBE_PATH.match(path)
+        if match:
+            video_id = match.group(1)
+        if video_id:
+            return f'youtube:{video_id}'
+    elif host == 'youtu.be' and len(path) > 1:
+        return f'youtube:{path[1:].split("/")[0]}'
+    elif host in ('twitter.com', 'x.com', 'mobile.twitter.com'):
+        match = _TWITTER_PATH.match(path)
+        if match:
+            return f'twitter:{match.group(1)}'
+    elif host == 'instagram.com':
+        match = _INSTAGRAM_PATH.match(path)
+        if match:
+            return f'instagram:{match.group(1)}'
+    elif host.endswith('tiktok.com'):
+        match = _TIKTOK_PATH.search(path)
+        if match:
+            return f'tiktok:{match.group(1)}'
+
+    query = {k: v for k, v in parse_qs(parsed.query).items() if k not in TRACKING_PARAMS}
+    canonical = f'{host}{path}'
+    if query:
+        canonical += '?' + urlencode(sorted(query.items()), doseq=True)
+    return f'url:{canonical}'
+
+
+class UrlCache:
+    """
+    canonical URL key -> content hash of the downloaded media (+ optional JSON
+    payload, e.g. the stored video id), kept in SQLite with a TTL. The content
+    hash is then the key into the verdict history.
+    """
+
+    def __init__(self, db_path: str = 'url_cache.db', ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS url_map (
+                url_key TEXT PRIMARY KEY,
+                content_hash TEXT,
+                payload TEXT,
+                updated_at REAL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_url_map_hash ON url_map(content_hash)')
+        self._conn.commit()
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """Fresh entry for this URL (any equivalent form), or None"""
+        key = canonicalize_url(url)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT content_hash, payload, updated_at FROM url_map WHERE url_key = ?', (key,)
+            ).fetchone()
+        if not row:
+            return None
+        content_hash, payload, updated_at = row
+        age = time.time() - updated_at
+        if self.ttl is not None and age > self.ttl:
+            return None
+        return {
+            'url_key': key,
+            'content_hash': content_hash,
+            'payload': json.loads(payload) if payload else None,
+            'age_seconds': round(age, 1)
+        }
+
+    def store(self, url: str, content_hash: str, payload: Optional[Dict[str, Any]] = None):
+        key = canonicalize_url(url)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO url_map (url_key, content_hash, payload, updated_at) VALUES (?, ?, ?, ?)',
+                (key, content_hash, json.dumps(payload) if payload is not None else None, time.time())
+            )
+            self._conn.commit()
+
+    def find_by_content(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Payload stored for the same media under any URL (e.g. a re-upload)"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url_key, payload FROM url_map WHERE content_hash = ? ORDER BY updated_at DESC LIMIT 1',
+                (content_hash,)
+            ).fetchone()
+        if not row:
+            return None
+        return {'url_key': row[0], 'payload': json.loads(row[1]) if row[1] else None}
+
+
+class RequestCoalescer:
+    """
+    Runs one coroutine per key at a time: concurrent callers with the same key
+    (e.g. the same video URL) await the first caller's result instead of
+    starting their own download.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def is_running(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def run(self, key: str, factory):
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await factory()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
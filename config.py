@@ -9,15 +9,64 @@ CELEB_FACES_DIR = "models/celebrity_faces"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(CELEB_FACES_DIR, exist_ok=True)
 
+# Supported media
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv']
+AUDIO_EXTENSIONS = ['.mp3', '.wav', '.flac', '.ogg', '.m4a']
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']
+
 # Model Configuration
 DEEPFAKE_MODEL = "prithivMLmods/Deep-Fake-Detector-v2-Model"
+CLASSIFIER_BATCH_SIZE = 32   # Face crops per forward pass of the deepfake classifier
 
 # Detection Thresholds
 BLINK_RATE_MIN = 3     # BPM
 BLINK_RATE_MAX = 35    # BPM
 AUDIO_CUTOFF_FREQ = 16000  # Hz
+VIDEO_AUDIO_SAMPLE_RATE = 44100  # Hz - rate video soundtracks are decoded at
+AUDIO_STREAMING_MIN_SECONDS = 600  # Longer recordings are analyzed block by block
+AUDIO_STREAM_BLOCK_SECONDS = 30    # Partial audio verdict every N seconds of audio
+
+# Audio near-duplicate index (re-encoded voice clips)
+AUDIO_FINGERPRINT_DB = "audio_fingerprints.db"
+AUDIO_MATCH_MIN_SIMILARITY = 0.15  # Fraction of the new clip's hashes that must align to report a match
+AUDIO_MATCH_MIN_HASHES = 20
+AUDIO_NEAR_DUPLICATE_CACHE = False  # Opt-in: reuse a matched clip's verdict instead of analyzing
+AUDIO_REUSE_MIN_SIMILARITY = 0.9    # ...only when nearly the whole new clip matches (no spliced-in speech)
 METADATA_EDIT_GAP = 1800   # 30 minutes in seconds
 
+# Provenance tracing (perceptual hash index)
+TRACE_INDEX_DIR = "trace_index"
+TRACE_MAX_DISTANCE = 10    # Max pHash Hamming distance (of 64 bits) reported as a match
+TRACE_MAX_MATCHES = 20
+
+# URL verification
+URL_CLIP_SECONDS = 30      # Only this much of a linked video is downloaded and analyzed
+URL_CACHE_DB = "url_cache.db"
+URL_CACHE_TTL = 24 * 3600  # How long a URL -> content mapping is trusted (seconds)
+URL_PARTIAL_VERDICT_SECONDS = 5    # Streamed URL checks report a partial verdict every N seconds of video
+URL_STREAM_HASH_BYTES = 2 * 1024 * 1024   # Streamed downloads are keyed by the hash of this prefix
+
+# NoiseNet protection registry
+PROTECTION_DB = "protection_records.db"
+PROTECTION_RECORDS_JSON = "protection_records.json"   # legacy list, imported once
+PROTECT_IN_MEMORY = True       # /api/protect: protect from request bytes, one write into the blob store
+PROTECTED_BLOB_DIR = "protected_blobs"
+PROTECT_BATCH_WORKERS = None    # Worker processes for /api/protect/batch (None = one per CPU)
+
+# Batch scanning (/api/scan/batch)
+SCAN_BATCH_WORKERS = {"image": 2, "video": 1, "audio": 2}   # Analyzer threads per media type
+SCAN_BATCH_HISTORY_EVERY = 25   # History file is rewritten once per this many finished files
+
+# Bulk scanning CLI (python -m deepfake scan DIR)
+SCAN_CHECKPOINT_DIR = "scan_checkpoints"
+SCAN_CLI_FLUSH_EVERY = 200      # Results are written to history and checkpointed once per this many files
+SCAN_CLI_PROGRESS_SECONDS = 5   # Seconds between progress lines
+
+# Near-duplicate image cache (same picture re-saved / resized by a platform)
+IMAGE_NEAR_DUPLICATE_CACHE = False   # Opt-in: a reused verdict skips analysis of the new file
+IMAGE_NEAR_DUPLICATE_DISTANCE = 4   # Max pHash Hamming distance to reuse an earlier verdict
+IMAGE_NEAR_DUPLICATE_DHASH_DISTANCE = 4   # ...and max dHash distance (catches local edits pHash misses)
+
 # ELA Configuration
 ELA_JPEG_QUALITY = 90
 ELA_SCALE_FACTOR = 10
@@ -0,0 +1,10 @@
+"""Headless entry points: python -m deepfake scan DIR"""
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Analyzers live in hackcryp/backend/services and read the shared config.py
+for path in (ROOT_DIR, os.path.join(ROOT_DIR, "hackcryp", "backend")):
+    if path not in sys.path:
+        sys.path.append(path)
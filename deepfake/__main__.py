@@ -0,0 +1,5 @@
+import sys
+
+from deepfake.cli import main
+
+sys.exit(main())
@@ -0,0 +1,322 @@
+"""
+Bulk scanner for large media archives, without the HTTP API:
+
+    python -m deepfake scan DIR [--workers N] [--restart]
+
+Files are fanned out over a process pool (models loaded once per worker),
+results go to the same scan history as /api/scan, and progress is
+checkpointed so an interrupted run resumes where it stopped.
+"""
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from config import (
+    HISTORY_FILE, IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, AUDIO_EXTENSIONS,
+    SCAN_CHECKPOINT_DIR, SCAN_CLI_FLUSH_EVERY, SCAN_CLI_PROGRESS_SECONDS
+)
+from deepfake.worker import init_worker, scan_file
+from services.scan_history import HistoryStore, HistoryReadError
+
+QUEUED_PER_WORKER = 2   # files handed to the pool ahead of time, per worker
+
+
+def media_type_of(filename):
+    """'image', 'video', 'audio' or None for unsupported files"""
+    name = filename.lower()
+    if name.endswith(tuple(IMAGE_EXTENSIONS)):
+        return "image"
+    if name.endswith(tuple(VIDEO_EXTENSIONS)):
+        return "video"
+    if name.endswith(tuple(AUDIO_EXTENSIONS)):
+        return "audio"
+    return None
+
+
+def iter_media_files(root):
+    """(path relative to root, media type) of every supported file, in a stable order"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for filename in sorted(filenames):
+            file_type = media_type_of(filename)
+            if file_type and not filename.startswith("."):
+                yield os.path.relpath(os.path.join(dirpath, filename), root), file_type
+
+
+# Same file and lock as the API server's history, so both can update it at once
+history_store = HistoryStore(HISTORY_FILE)
+
+
+class Checkpoint:
+    """
+    Progress of one scanned directory, one relative path per line. Files are
+    listed once their results are in the history file; files that crashed a
+    worker process are listed with a "! " prefix so a resume does not hit
+    them again. Files that merely failed are not listed and get retried.
+    """
+
+    CRASHED = "! "
+
+    def __init__(self, root):
+        self.root = root
+        key = hashlib.md5(root.encode("utf-8")).hexdigest()[:12]
+        self.path = os.path.join(SCAN_CHECKPOINT_DIR, f"{key}.txt")
+
+    def load(self):
+        """(finished paths, crashed paths)"""
+        finished, crashed = set(), set()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.rstrip("\n")
+                    if line.startswith(self.CRASHED):
+                        crashed.add(line[len(self.CRASHED):])
+                    elif line and not line.startswith("#"):
+                        finished.add(line)
+        return finished, crashed
+
+    def add(self, paths, crashed=()):
+        if not paths and not crashed:
+            return
+        os.makedirs(SCAN_CHECKPOINT_DIR, exist_ok=True)
+        is_new = not os.path.exists(self.path)
+        with open(self.path, "a", encoding="utf-8") as f:
+            if is_new:
+                f.write(f"# {self.root}\n")
+            f.writelines(path + "\n" for path in paths)
+            f.writelines(self.CRASHED + path + "\n" for path in crashed)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def scan_isolated(root, item, initargs):
+    """
+    Scan one file alone in a fresh single-worker pool, after a worker died with
+    it in flight. Returns its entry; "crashed" is set when it takes this worker down too.
+    """
+    with ProcessPoolExecutor(max_workers=1, initializer=init_worker, initargs=initargs) as pool:
+        try:
+            return pool.submit(scan_file, root, *item).result()
+        except BrokenProcessPool:
+            return {"path": item[0], "file_type": item[1], "bytes": 0, "timings": {},
+                    "error": "worker process crashed", "crashed": True}
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class ScanStats:
+    """Throughput, ETA and per-stage timing of one run"""
+
+    def __init__(self, total):
+        self.total = total
+        self.start = time.perf_counter()
+        self.done = 0
+        self.failed = 0
+        self.crashed = 0
+        self.bytes = 0
+        self.by_type = {}
+        self.stage_seconds = {}
+        self.stage_files = {}
+        self.errors = []
+
+    def add(self, entry):
+        self.done += 1
+        self.bytes += entry["bytes"]
+        self.by_type[entry["file_type"]] = self.by_type.get(entry["file_type"], 0) + 1
+        if "error" in entry:
+            self.failed += 1
+            self.crashed += bool(entry.get("crashed"))
+            self.errors.append((entry["path"], entry["error"]))
+        for stage, seconds in entry["timings"].items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            self.stage_files[stage] = self.stage_files.get(stage, 0) + 1
+
+    def progress_line(self):
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = format_duration((self.total - self.done) / rate) if rate > 0 else "?"
+        return (f"   [{self.done}/{self.total}] {self.done / self.total * 100:5.1f}%  "
+                f"{rate:.2f} files/s  {self.bytes / 1e6 / elapsed:.1f} MB/s  "
+                f"ETA {eta}  errors {self.failed}")
+
+    def print_summary(self):
+        elapsed = time.perf_counter() - self.start
+        print(f"\n📊 {self.done} files in {format_duration(elapsed)} "
+              f"({self.done / elapsed:.2f} files/s, {self.bytes / 1e6 / elapsed:.1f} MB/s), {self.failed} failed")
+        print("   " + ", ".join(f"{count} {file_type}" for file_type, count in sorted(self.by_type.items())))
+
+        # Worker time per stage, summed over all workers
+        busy = sum(self.stage_seconds.values())
+        if busy > 0:
+            print(f"   {'stage':<16}{'files':>8}{'total s':>10}{'avg ms':>10}{'share':>8}")
+            for stage, seconds in sorted(self.stage_seconds.items(), key=lambda item: -item[1]):
+                files = self.stage_files[stage]
+                print(f"   {stage:<16}{files:>8}{seconds:>10.1f}{seconds / files * 1000:>10.1f}{seconds / busy * 100:>7.1f}%")
+
+        for path, error in self.errors[:10]:
+            print(f"   ❌ {path}: {error}")
+        if len(self.errors) > 10:
+            print(f"   ... and {len(self.errors) - 10} more failures")
+
+
+def run_scan(directory, workers, restart=False, flush_every=SCAN_CLI_FLUSH_EVERY, verbose=False):
+    root = os.path.abspath(directory)
+    if not os.path.isdir(root):
+        print(f"❌ Not a directory: {directory}")
+        return 2
+
+    checkpoint = Checkpoint(root)
+    if restart:
+        checkpoint.remove()
+    finished, crashed = checkpoint.load()
+    media_files = list(iter_media_files(root))
+    todo = [item for item in media_files if item[0] not in finished and item[0] not in crashed]
+
+    print(f"📂 {root}: {len(media_files)} media files")
+    if len(todo) < len(media_files):
+        print(f"   ⏩ Resuming: {len(finished)} already done ({checkpoint.path})")
+    if crashed:
+        print(f"   ⚠️ Skipping {len(crashed)} files that crashed a worker earlier (--restart retries them)")
+    if not todo:
+        if not crashed:
+            checkpoint.remove()
+        print("✅ Nothing left to scan")
+        return 0
+
+    try:
+        history_store.read()
+    except HistoryReadError as e:
+        print(f"❌ {e} - fix or move it before scanning")
+        return 2
+
+    workers = max(1, min(workers, len(todo)))
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    initargs = (threads_per_worker, not verbose)
+    print(f"   🚀 {workers} worker processes x {threads_per_worker} threads, loading models...")
+
+    stats = ScanStats(len(todo))
+    pending_results = {}
+    pending_paths = []
+    pending_crashed = []
+
+    def record(entry):
+        stats.add(entry)
+        if "result" in entry:
+            pending_results[entry["content_hash"]] = entry["result"]
+            pending_paths.append(entry["path"])
+        elif entry.get("crashed"):
+            pending_crashed.append(entry["path"])
+
+    def flush():
+        try:
+            history_store.update(pending_results)
+        except HistoryReadError as e:
+            # Keep the results and retry on the next flush rather than overwrite the history
+            print(f"   ⚠️ History not saved: {e}", flush=True)
+            checkpoint.add([], pending_crashed)
+            pending_crashed.clear()
+            return
+        checkpoint.add(pending_paths, pending_crashed)
+        pending_results.clear()
+        pending_paths.clear()
+        pending_crashed.clear()
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=initargs)
+    queue = iter(todo)
+    running = {}     # future -> (path, media type)
+    last_progress = time.perf_counter()
+    status = None
+    try:
+        while True:
+            while len(running) < workers * QUEUED_PER_WORKER:
+                item = next(queue, None)
+                if item is None:
+                    break
+                running[pool.submit(scan_file, root, *item)] = item
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            broken = []
+            for future in done:
+                item = running.pop(future)
+                try:
+                    record(future.result())
+                except BrokenProcessPool:
+                    broken.append(item)
+
+            if broken:
+                # A worker died (out of memory, crash in a native decoder...). Every file
+                # in flight failed with it: retry each alone to find the culprit, then
+                # carry on with a new pool
+                broken += running.values()
+                running.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                print(f"   ⚠️ A worker process died - retrying {len(broken)} files one by one", flush=True)
+                for item in broken:
+                    entry = scan_isolated(root, item, initargs)
+                    if entry.get("crashed"):
+                        print(f"   ❌ {item[0]} crashes the analyzers - skipped", flush=True)
+                    record(entry)
+                flush()
+                pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=initargs)
+
+            if len(pending_paths) + len(pending_crashed) >= flush_every:
+                flush()
+            if time.perf_counter() - last_progress >= SCAN_CLI_PROGRESS_SECONDS:
+                last_progress = time.perf_counter()
+                print(stats.progress_line(), flush=True)
+        status = 0
+    except KeyboardInterrupt:
+        status = 130
+    finally:
+        # Whatever happened, keep the results that came back
+        pool.shutdown(wait=status == 0, cancel_futures=True)
+        flush()
+        stats.print_summary()
+
+    if status:
+        print("\n⏸️ Interrupted - run the same command again to resume")
+        return status
+
+    if pending_results:
+        print(f"\n❌ {len(pending_results)} results could not be saved to {HISTORY_FILE} - run the same command again once it is readable")
+        return 1
+
+    print(f"\n✅ Results saved to {HISTORY_FILE}")
+    if stats.failed > stats.crashed:
+        print(f"   {stats.failed - stats.crashed} files failed - run the same command again to retry them")
+    elif stats.crashed or crashed:
+        print(f"   Files that crashed a worker are listed in {checkpoint.path}")
+    else:
+        checkpoint.remove()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m deepfake", description="Headless deepfake detection")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="scan every image, video and audio file under a directory")
+    scan.add_argument("directory")
+    scan.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                      help="worker processes, each with its own copy of the models (default: one per CPU)")
+    scan.add_argument("--restart", action="store_true", help="ignore the checkpoint and scan everything again")
+    scan.add_argument("--flush-every", type=int, default=SCAN_CLI_FLUSH_EVERY,
+                      help=f"write results and checkpoint every N files (default: {SCAN_CLI_FLUSH_EVERY})")
+    scan.add_argument("--verbose", action="store_true", help="show the analyzers' per-file output")
+
+    args = parser.parse_args(argv)
+    if args.command == "scan":
+        return run_scan(args.directory, args.workers, args.restart, args.flush_every, args.verbose)
+    return 2
@@ -0,0 +1,123 @@
+"""
+Worker-process side of the bulk scanner. init_worker imports the analyzers
+(loading the models) once per process; scan_file then runs one file through
+the same pipelines as the API and reports the seconds spent per stage.
+"""
+import hashlib
+import os
+import sys
+import time
+
+
+def init_worker(threads_per_worker=None, quiet=True):
+    """
+    Process-pool initializer: import the analyzers, which loads the models,
+    once for every file this worker scans. `quiet` silences their per-file prints.
+    """
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+    if threads_per_worker:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+
+    import services.image_analyzer
+    import services.metadata_scanner
+    import services.audio_analyzer
+    import services.stream_analyzer
+
+
+def file_md5(file_path, chunk_size=1024 * 1024):
+    """Same content hash as the API's history cache, read in chunks"""
+    hasher = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _scan_image(file_path, timings):
+    from services.image_analyzer import analyze_image_complete
+    from services.metadata_scanner import full_metadata_analysis
+
+    start = time.perf_counter()
+    analysis_result = analyze_image_complete(file_path)
+    timings["image_analysis"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    metadata_result = full_metadata_analysis(file_path)
+    timings["metadata"] = time.perf_counter() - start
+
+    return {
+        **analysis_result,
+        "metadata_info": metadata_result,
+        "protected": False,
+        "protected_filename": None
+    }
+
+
+def _scan_video(file_path, timings):
+    from services.stream_analyzer import analyze_video_file
+
+    return analyze_video_file(file_path, timings=timings)
+
+
+def _scan_audio(file_path, timings):
+    from services.audio_analyzer import (
+        analyze_audio_full, load_audio, compute_audio_features, should_stream_audio, summarize_audio_result
+    )
+    from services.media_demuxer import probe_media
+
+    # Decode once; long recordings go through the streaming path instead
+    start = time.perf_counter()
+    features = None
+    if not should_stream_audio(probe_media(file_path)["duration_seconds"]):
+        audio = load_audio(file_path)
+        if audio is not None:
+            features = compute_audio_features(*audio)
+    timings["audio_decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if features is not None:
+        audio_result = analyze_audio_full(file_path, features=features)
+    else:
+        audio_result = analyze_audio_full(file_path, is_video=False)
+    timings["audio_analysis"] = time.perf_counter() - start
+
+    return summarize_audio_result(audio_result)
+
+
+SCANNERS = {"image": _scan_image, "video": _scan_video, "audio": _scan_audio}
+
+
+def scan_file(root, rel_path, file_type):
+    """
+    Scan one file (path relative to the scanned root). Never raises: returns
+    {"path", "file_type", "bytes", "timings"} plus "content_hash" and "result",
+    or "error" when the file could not be analyzed.
+    """
+    file_path = os.path.join(root, rel_path)
+    entry = {"path": rel_path, "file_type": file_type, "bytes": 0, "timings": {}}
+    timings = entry["timings"]
+    try:
+        entry["bytes"] = os.path.getsize(file_path)
+
+        start = time.perf_counter()
+        content_hash = file_md5(file_path)
+        timings["hash"] = time.perf_counter() - start
+
+        result = SCANNERS[file_type](file_path, timings)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        entry["content_hash"] = content_hash
+        entry["result"] = {
+            "file_type": file_type,
+            "filename": os.path.basename(rel_path),
+            "content_hash": content_hash,
+            **result,
+            "source_path": file_path,
+            "cached": False,
+            "scan_timestamp": time.time()
+        }
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+    return entry
@@ -2,20 +2,21 @@ const BACKEND_URL = 'http://192.168.0.108:8000';
 
 /**
  * Send frame batch to backend for analysis
- * @param {Array<string>} frames - Array of base64 encoded frame images
+ * Frames are uploaded as binary multipart parts (no base64/JSON overhead)
+ * @param {Array<Blob|string>} frames - JPEG Blobs or base64 data URLs
  * @returns {Promise<Object>} Analysis results
  */
 async function analyzeFrameBatch(frames) {
   try {
+    const formData = new FormData();
+    frames.forEach((frame, i) => {
+      const blob = typeof frame === 'string' ? base64ToBlob(frame) : frame;
+      formData.append('frames', blob, `frame${i}.jpg`);
+    });
+    
     const response = await fetch(`${BACKEND_URL}/api/analyze-frames`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({
-        frames: frames,
-        count: frames.length
-      })
+      body: formData
     });
     
     if (!response.ok) {
@@ -80,3 +81,36 @@ function base64ToBlob(base64) {
   
   return new Blob([u8arr], { type: mimeType });
 }
+
+/**
+ * Open a live-analysis WebSocket session
+ * Frames are sent as binary JPEG Blobs; the server keeps per-session state
+ * (blink window, face score average) and only analyzes the newest frame
+ * when it falls behind.
+ * @param {Function} onVerdict - Called with every verdict object
+ * @returns {{sendFrame: Function, reset: Function, close: Function}}
+ */
+function openLiveAnalysis(onVerdict) {
+  const socket = new WebSocket(`${BACKEND_URL.replace(/^http/, 'ws')}/api/ws/analyze-live`);
+  socket.binaryType = 'arraybuffer';
+  
+  socket.onmessage = (event) => {
+    onVerdict(JSON.parse(event.data));
+  };
+  socket.onerror = (error) => {
+    console.error('Live analysis error:', error);
+  };
+  
+  return {
+    sendFrame(frame) {
+      if (socket.readyState !== WebSocket.OPEN) return;
+      socket.send(typeof frame === 'string' ? base64ToBlob(frame) : frame);
+    },
+    reset() {
+      socket.send(JSON.stringify({ type: 'reset' }));
+    },
+    close() {
+      socket.close();
+    }
+  };
+}
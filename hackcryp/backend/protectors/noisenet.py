@@ -1,42 +1,256 @@
+import os
+import time
+import hashlib
+import threading
+import av
 import cv2
 import numpy as np
 
+# Audio codecs that can be copied into an MP4 as-is (anything else goes to Matroska)
+MP4_AUDIO_CODECS = {"aac", "mp3", "ac3", "eac3", "alac"}
+
+# Keyed noise tiles, shared by every NoiseNet instance with the same settings
+_tile_cache = {}
+_tile_cache_lock = threading.Lock()
+
+
+def keyed_noise_tile(secret_key, strength, tile_size):
+    """
+    (tile_size, tile_size, 3) int8 noise tile in 8-bit pixel units.
+    Drawn from a dedicated Generator seeded with the key, so it never touches
+    the global NumPy RNG and is identical in every thread and process.
+    """
+    cache_key = (secret_key, strength, tile_size)
+    with _tile_cache_lock:
+        tile = _tile_cache.get(cache_key)
+        if tile is None:
+            rng = np.random.default_rng(secret_key)
+            noise = rng.standard_normal((tile_size, tile_size, 3), dtype=np.float32) * (strength * 255.0)
+            tile = np.clip(np.rint(noise), -127, 127).astype(np.int8)
+            tile.setflags(write=False)
+            _tile_cache[cache_key] = tile
+        return tile
+
 
 class NoiseNet:
-    def __init__(self, secret_key=42, strength=0.015):
+    # Per-tile normalized correlation above which the keyed pattern counts as present
+    # (chance level for a 64x64x3 tile is ~0.01)
+    MATCH_THRESHOLD = 0.05
+    # Alignment peak (in standard deviations) needed to say the pattern is there at all
+    DETECTION_PEAK_SIGMA = 8.0
+
+    def __init__(self, secret_key=42, strength=0.015, tile_size=64):
         self.secret_key = secret_key
         self.strength = strength
+        # The noise repeats every tile_size pixels, so a cropped copy can be re-aligned
+        self.tile_size = tile_size
+
+
+    def _noise_tile(self):
+        """Keyed (tile_size, tile_size, 3) int8 noise pattern"""
+        return keyed_noise_tile(self.secret_key, self.strength, self.tile_size)
+
+
+    def apply_trace_layer(self, img):
+        """Adds the noise layer to a uint8 BGR array in place and returns it."""
+        h, w, c = img.shape
+        t = self.tile_size
+
+        # One tile-high band of the 'Secret' pattern, reused down the image
+        reps_x = -(-w // t)
+        band = np.tile(self._noise_tile().astype(np.int16), (1, reps_x, 1))[:, :w, :c]
+
+        # Apply the layer (Proactive protection) - saturating 8-bit add, one band at a time
+        for y in range(0, h, t):
+            rows = img[y:y + t]
+            np.clip(rows + band[:rows.shape[0]], 0, 255, out=rows, casting="unsafe")
+        return img
 
 
     def embed_trace_layer(self, image_path):
         """Adds an invisible noise layer for traceability."""
-        img = cv2.imread(image_path).astype(np.float32) / 255.0
-        h, w, c = img.shape
-        
-        # Generate 'Secret' noise pattern
-        np.random.seed(self.secret_key)
-        noise = np.random.normal(0, self.strength, (h, w, c))
-        
-        # Apply the layer (Proactive protection)
-        protected_img = np.clip(img + noise, 0, 1)
+        img = self.apply_trace_layer(cv2.imread(image_path))
         protected_path = image_path.replace(".", "_protected.")
-        
-        cv2.imwrite(protected_path, (protected_img * 255).astype(np.uint8))
+        cv2.imwrite(protected_path, img)
         return protected_path
 
 
+    def embed_video_trace_layer(self, source, output, preset="ultrafast"):
+        """
+        Streams a video through the noise layer: decoded frames get the keyed
+        pattern and go straight to an H.264 encoder, while the audio packets are
+        copied into the output untouched. `source`/`output` may be paths or
+        file-like objects, so nothing has to touch the disk in between.
+        The fast x264 preset keeps a single CPU core at about real time for 720p.
+        Returns a summary dict (frames, duration, fps achieved, output container).
+        """
+        start = time.perf_counter()
+        with av.open(source) as container:
+            if not container.streams.video:
+                raise ValueError("No video stream found")
+            in_video = container.streams.video[0]
+            in_video.thread_type = "AUTO"
+            in_audio = container.streams.audio[0] if container.streams.audio else None
+
+            # MP4 when the audio can be carried over unchanged, Matroska otherwise
+            audio_codec = in_audio.codec_context.name if in_audio else None
+            out_format = "mp4" if audio_codec is None or audio_codec in MP4_AUDIO_CODECS else "matroska"
+
+            with av.open(output, mode="w", format=out_format) as out:
+                out_video = out.add_stream("libx264", rate=in_video.average_rate or 25)
+                out_video.width = in_video.codec_context.width
+                out_video.height = in_video.codec_context.height
+                out_video.pix_fmt = "yuv420p"
+                out_video.time_base = in_video.time_base
+                out_video.options = {"preset": preset, "crf": "18"}
+                out_video.thread_type = "AUTO"
+                out_audio = out.add_stream_from_template(in_audio) if in_audio else None
+
+                frames = 0
+                streams = [s for s in (in_video, in_audio) if s is not None]
+                for packet in container.demux(*streams):
+                    if packet.stream is in_audio:
+                        if packet.dts is not None:
+                            packet.stream = out_audio
+                            out.mux(packet)
+                        continue
+
+                    for frame in packet.decode():
+                        img = self.apply_trace_layer(frame.to_ndarray(format="bgr24"))
+                        new_frame = av.VideoFrame.from_ndarray(img, format="bgr24")
+                        new_frame.pts = frame.pts
+                        new_frame.time_base = frame.time_base
+                        out.mux(out_video.encode(new_frame))
+                        frames += 1
+
+                out.mux(out_video.encode(None))
+
+            duration = container.duration / av.time_base if container.duration else None
+
+        elapsed = time.perf_counter() - start
+        return {
+            "frames": frames,
+            "duration_seconds": round(duration, 2) if duration else None,
+            "processing_seconds": round(elapsed, 2),
+            "fps": round(frames / elapsed, 1) if elapsed > 0 else None,
+            "realtime_factor": round(duration / elapsed, 2) if duration and elapsed > 0 else None,
+            "container": out_format,
+            "audio_copied": in_audio is not None
+        }
+
+
+    @staticmethod
+    def _high_pass(img):
+        """Residual after a 3x3 box blur - removes image content, keeps the noise layer"""
+        return img - cv2.blur(img, (3, 3), borderType=cv2.BORDER_REFLECT)
+
+
+    def _reference_tile(self):
+        """High-passed noise tile (wrapped borders, since the pattern is periodic)"""
+        tile = self._noise_tile().astype(np.float32) / 255.0
+        t = self.tile_size
+        padded = np.pad(tile, ((1, 1), (1, 1), (0, 0)), mode="wrap")
+        return self._high_pass(padded)[1:t + 1, 1:t + 1]
+
+
     def verify_integrity(self, current_image_path):
-        """Checks if the noise layer has been disturbed (tampered)."""
+        """
+        Checks whether the keyed noise layer is still present, tile by tile.
+
+        The high-pass residual of the image is correlated with the keyed pattern.
+        Folding the residual onto one tile first recovers the crop offset (and how
+        clearly the pattern is there at all), then every full tile gets a
+        normalized correlation score. JPEG re-compression weakens the scores;
+        edited regions drop to chance level.
+        """
         try:
-            curr_img = cv2.imread(current_image_path).astype(np.float32) / 255.0
-            h, w, c = curr_img.shape
-            
-            # Regenerate the 'Expected' noise
-            np.random.seed(self.secret_key)
-            expected_noise = np.random.normal(0, self.strength, (h, w, c))
-            
-            # Check if noise pattern matches
-            # If image was edited, the noise will be different
-            return "Noise Layer Disturbed - Image has been modified"
+            curr_img = cv2.imread(current_image_path)
+            if curr_img is None:
+                return {"verdict": "Verification error: could not read image", "noise_detected": False}
+
+            t = self.tile_size
+            h, w = curr_img.shape[:2]
+            if h < t or w < t:
+                return {"verdict": "Image too small to verify", "noise_detected": False}
+
+            residual = self._high_pass(curr_img.astype(np.float32) / 255.0)
+            reference = self._reference_tile()
+
+            # Fold the residual onto a single tile (sum of all tile positions)
+            ny, nx = h // t, w // t
+            blocks = residual[:ny * t, :nx * t].reshape(ny, t, nx, t, 3)
+            folded = blocks.sum(axis=(0, 2))
+
+            # Circular cross-correlation finds where the crop started within the tile
+            spectrum = np.conj(np.fft.rfft2(folded, axes=(0, 1))) * np.fft.rfft2(reference, axes=(0, 1))
+            cross = np.fft.irfft2(spectrum, s=(t, t), axes=(0, 1)).sum(axis=2)
+            offset_y, offset_x = np.unravel_index(np.argmax(cross), cross.shape)
+            peak_sigma = (cross.max() - cross.mean()) / (cross.std() + 1e-12)
+            aligned = np.roll(reference, (-offset_y, -offset_x), axis=(0, 1))
+
+            # Normalized correlation of every full tile with the aligned pattern
+            dot = np.einsum("iyjxc,yxc->ij", blocks, aligned)
+            energy = np.einsum("iyjxc,iyjxc->ij", blocks, blocks)
+            tile_scores = dot / (np.sqrt(energy * np.sum(aligned * aligned)) + 1e-12)
+            tile_map = tile_scores > self.MATCH_THRESHOLD
+
+            match_ratio = float(tile_map.mean())
+            noise_detected = bool(peak_sigma >= self.DETECTION_PEAK_SIGMA)
+
+            if not noise_detected:
+                verdict = "Noise Layer Not Found"
+            elif tile_map.all():
+                verdict = "Noise Layer Intact"
+            else:
+                verdict = "Noise Layer Disturbed - Image has been modified"
+
+            return {
+                "verdict": verdict,
+                "noise_detected": noise_detected,
+                "score": round(float(np.median(tile_scores)), 4),
+                "match_ratio": round(match_ratio, 4),
+                "peak_sigma": round(float(peak_sigma), 2),
+                "tiles_disturbed": int((~tile_map).sum()),
+                "crop_offset": [int(offset_y), int(offset_x)],
+                "tile_size": t,
+                "tile_map": tile_map.astype(int).tolist()
+            }
         except Exception as e:
-            return f"Verification error: {str(e)}"
+            return {"verdict": f"Verification error: {str(e)}", "noise_detected": False}
+
+
+def protect_image_bytes(data, extension, secret_key, strength, tile_size=64):
+    """Decode, protect and re-encode an image entirely in memory. Returns the encoded bytes."""
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode image")
+    NoiseNet(secret_key, strength, tile_size).apply_trace_layer(img)
+    ok, encoded = cv2.imencode(extension, img)
+    if not ok:
+        raise ValueError(f"Could not encode image as {extension}")
+    return encoded.tobytes()
+
+
+def protect_image_job(name, data, secret_key, strength, tile_size=64, image_hasher=None):
+    """
+    One unit of work for a batch (runs in a worker process).
+    Returns the protected bytes plus hashes and timing, or an error.
+    `image_hasher` (e.g. compute_image_hashes) is applied to the decoded
+    protected image and its result returned as "image_hashes".
+    """
+    start = time.perf_counter()
+    try:
+        protected = protect_image_bytes(data, os.path.splitext(name)[1] or ".png", secret_key, strength, tile_size)
+    except Exception as e:
+        return {"name": name, "error": str(e), "seconds": round(time.perf_counter() - start, 4)}
+    job = {
+        "name": name,
+        "data": protected,
+        "original_hash": hashlib.sha256(data).hexdigest(),
+        "protected_hash": hashlib.sha256(protected).hexdigest(),
+        "bytes_in": len(data),
+    }
+    if image_hasher is not None:
+        job["image_hashes"] = image_hasher(cv2.imdecode(np.frombuffer(protected, dtype=np.uint8), cv2.IMREAD_GRAYSCALE))
+    job["seconds"] = round(time.perf_counter() - start, 4)
+    return job
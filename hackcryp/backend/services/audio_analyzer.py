@@ -1,175 +1,280 @@
 import librosa
 import numpy as np
+import soundfile as sf
 import os
 import sys
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from moviepy.editor import VideoFileClip
-from config import AUDIO_CUTOFF_FREQ
+from config import AUDIO_CUTOFF_FREQ, AUDIO_STREAMING_MIN_SECONDS, AUDIO_STREAM_BLOCK_SECONDS, VIDEO_AUDIO_SAMPLE_RATE
+from services.media_demuxer import MediaDemuxer, probe_media
 
 
 def extract_audio_from_video(video_path):
-    """Extract audio from video file"""
+    """
+    Decode the audio track of a video straight into memory.
+    Returns (samples, sample_rate) or None if the container has no audio.
+    """
     try:
         print(f"Extracting audio from {os.path.basename(video_path)}...")
-        clip = VideoFileClip(video_path)
-        
-        # Check if video has audio
-        if clip.audio is None:
-            print(f"⚠️ Video has no audio track")
-            clip.close()
-            return None
-        
-        temp_audio_path = "temp_uploads/temp_extracted_audio.wav"
-        clip.audio.write_audiofile(temp_audio_path, logger=None)
-        clip.close()  # ← Important: close the clip
-        del clip  # ← Free memory
-        return temp_audio_path
+        with MediaDemuxer(video_path) as media:
+            # Check if video has audio
+            if not media.has_audio:
+                print(f"⚠️ Video has no audio track")
+                return None
+            return media.audio()
     except Exception as e:
         print(f"Error extracting audio: {e}")
         return None
 
 
-def analyze_high_frequency_cutoff(file_path):
+def load_audio(file_path, is_video=False):
     """
-    Analyze audio for high-frequency cutoff (AI voice indicator)
-    AI voices often have sharp cutoffs above 16kHz
+    Decode an audio or video file once into mono float32 samples.
+    Returns (samples, sample_rate) or None.
     """
+    if is_video:
+        return extract_audio_from_video(file_path)
+    
     if not file_path or not os.path.exists(file_path):
         return None
     
     try:
-        # Load audio
-        y, sr = librosa.load(file_path, sr=None)
-        
-        # Compute spectrogram
-        D = librosa.stft(y)
-        S_db = librosa.amplitude_to_db(np.abs(D), ref=np.max)
+        y, sr = librosa.load(file_path, sr=None, dtype=np.float32)
+        return y, sr
+    except Exception as e:
+        print(f"librosa could not load audio ({e}), decoding with PyAV...")
+    
+    # m4a/aac and friends when no audioread backend is installed
+    try:
+        with MediaDemuxer(file_path, audio_sample_rate=None) as media:
+            return media.audio()
+    except Exception as e:
+        print(f"Error loading audio: {e}")
+        return None
+
+
+def compute_audio_features(y, sr):
+    """
+    Shared spectral features computed once per file and reused by every check.
+    Only the float32 magnitude spectrogram is kept (the complex STFT is dropped).
+    """
+    y = np.asarray(y, dtype=np.float32)
+    magnitude = np.abs(librosa.stft(y))
+    
+    return {
+        "y": y,
+        "sr": sr,
+        "magnitude": magnitude,
+        "freqs": librosa.fft_frequencies(sr=sr),
+    }
+
+
+def _band_db(features, rows, top_db=80.0):
+    """
+    dB values (ref=np.max, like librosa.amplitude_to_db) for a subset of
+    frequency rows only. The global peak always maps to 0 dB, so the
+    top_db floor is simply -top_db.
+    """
+    magnitude = features["magnitude"]
+    band_db = librosa.amplitude_to_db(magnitude[rows, :], ref=magnitude.max(), top_db=None)
+    return np.maximum(band_db, -top_db)
+
+
+def _high_frequency_result(avg_high_freq_energy, sr):
+    """Verdict for the average dB energy above AUDIO_CUTOFF_FREQ (None = no such bins)"""
+    is_fake = False
+    
+    if avg_high_freq_energy is None:
+        avg_high_freq_energy = -80
+        verdict = "INCONCLUSIVE: Sample rate too low"
+    # Threshold logic
+    elif avg_high_freq_energy < -70:
+        verdict = "FAKE AUDIO: High Frequency Cutoff Detected"
+        is_fake = True
+    else:
+        verdict = "REAL AUDIO: Natural Spectrum"
+    
+    return {
+        "avg_high_freq_energy": round(float(avg_high_freq_energy), 2),
+        "sample_rate": sr,
+        "verdict": verdict,
+        "is_fake": is_fake
+    }
+
+
+def analyze_high_frequency_cutoff(file_path, features=None):
+    """
+    Analyze audio for high-frequency cutoff (AI voice indicator)
+    AI voices often have sharp cutoffs above 16kHz
+    `features` is the shared output of compute_audio_features (decoded on demand otherwise)
+    """
+    if features is None:
+        audio = load_audio(file_path)
+        if audio is None:
+            return None
+    
+    try:
+        if features is None:
+            features = compute_audio_features(*audio)
+        sr = features["sr"]
         
         # Analyze high frequencies
-        freqs = librosa.fft_frequencies(sr=sr)
+        freqs = features["freqs"]
         high_freq_indices = np.where(freqs > AUDIO_CUTOFF_FREQ)[0]
         
-        verdict = "INCONCLUSIVE"
-        is_fake = False
-        avg_high_freq_energy = -80
-        
+        avg_high_freq_energy = None
         if len(high_freq_indices) > 0:
-            high_freq_energy = S_db[high_freq_indices, :]
+            high_freq_energy = _band_db(features, high_freq_indices)
             avg_high_freq_energy = np.mean(high_freq_energy)
-            
-            # Threshold logic
-            if avg_high_freq_energy < -70:
-                verdict = "FAKE AUDIO: High Frequency Cutoff Detected"
-                is_fake = True
-            else:
-                verdict = "REAL AUDIO: Natural Spectrum"
-                is_fake = False
-        else:
-            verdict = "INCONCLUSIVE: Sample rate too low"
         
-        return {
-            "avg_high_freq_energy": round(float(avg_high_freq_energy), 2),
-            "sample_rate": sr,
-            "verdict": verdict,
-            "is_fake": is_fake
-        }
+        return _high_frequency_result(avg_high_freq_energy, sr)
         
     except Exception as e:
         print(f"Error analyzing audio: {e}")
         return None
 
 
-def analyze_silence_patterns(file_path):
+def _silence_result(silence_gaps_count, breathing_detected, enough_segments=True):
+    """Verdict from the number of silence gaps and how many of them contain breathing"""
+    if not enough_segments:
+        return {
+            "silence_gaps_count": 0,
+            "has_breathing_sounds": False,
+            "verdict": "INCONCLUSIVE: Not enough audio segments",
+            "is_fake": False
+        }
+    
+    has_breathing = breathing_detected > silence_gaps_count * 0.3  # 30% of gaps
+    
+    verdict = "REAL AUDIO: Natural breathing detected" if has_breathing else "SUSPICIOUS: No breathing in silence"
+    
+    return {
+        "silence_gaps_count": silence_gaps_count,
+        "breathing_gaps_detected": breathing_detected,
+        "has_breathing_sounds": has_breathing,
+        "verdict": verdict,
+        "is_fake": not has_breathing
+    }
+
+
+def _gap_band_energies(features, gaps, low_hz, high_hz, hop_length=512):
+    """
+    Mean spectrogram magnitude in (low_hz, high_hz) for every (start, end) sample
+    range in `gaps`, computed from the shared spectrogram in one pass.
+    Frame t of the (centered) STFT belongs to a gap if t * hop falls inside it.
+    """
+    if len(gaps) == 0:
+        return np.zeros(0, dtype=np.float32)
+    
+    magnitude = features["magnitude"]
+    freqs = features["freqs"]
+    band_rows = np.where((freqs > low_hz) & (freqs < high_hz))[0]
+    if len(band_rows) == 0:
+        return np.zeros(len(gaps), dtype=np.float32)
+    
+    # Per-frame band energy, then per-gap means through a cumulative sum
+    frame_energy = magnitude[band_rows, :].mean(axis=0, dtype=np.float64)
+    cumulative = np.concatenate([[0.0], np.cumsum(frame_energy)])
+    
+    bounds = np.asarray(gaps, dtype=np.int64)
+    first = np.minimum(-(-bounds[:, 0] // hop_length), len(frame_energy))
+    last = np.minimum(-(-bounds[:, 1] // hop_length), len(frame_energy))
+    counts = np.maximum(last - first, 1)
+    
+    return (cumulative[last] - cumulative[first]) / counts
+
+
+def analyze_silence_patterns(file_path, features=None):
     """
     Analyze silence patterns for breathing sounds
     Real humans have natural breathing in silence gaps
     AI voices often have perfectly clean silence
+    `features` is the shared output of compute_audio_features (decoded on demand otherwise)
     """
-    if not file_path or not os.path.exists(file_path):
-        return None
+    if features is None:
+        audio = load_audio(file_path)
+        if audio is None:
+            return None
     
     try:
-        y, sr = librosa.load(file_path, sr=None)
+        if features is None:
+            features = compute_audio_features(*audio)
+        y, sr = features["y"], features["sr"]
         
         # Detect non-silent intervals
         intervals = librosa.effects.split(y, top_db=30)
         
         if len(intervals) < 2:
-            return {
-                "silence_gaps_count": 0,
-                "has_breathing_sounds": False,
-                "verdict": "INCONCLUSIVE: Not enough audio segments",
-                "is_fake": False
-            }
-        
-        # Calculate silence gaps
-        silence_gaps = []
-        for i in range(len(intervals) - 1):
-            gap_start = intervals[i][1]
-            gap_end = intervals[i + 1][0]
-            gap_duration = (gap_end - gap_start) / sr
-            
-            if gap_duration > 0.1:  # At least 100ms gap
-                silence_gaps.append((gap_start, gap_end))
-        
-        # Analyze silence gaps for low-frequency noise (breathing)
-        breathing_detected = 0
-        for gap_start, gap_end in silence_gaps[:5]:  # Check first 5 gaps
-            silence_segment = y[gap_start:gap_end]
-            
-            # Check for low-frequency energy (breathing is typically 100-500 Hz)
-            S = np.abs(librosa.stft(silence_segment))
-            freqs = librosa.fft_frequencies(sr=sr)
-            low_freq_indices = np.where((freqs > 100) & (freqs < 500))[0]
-            
-            if len(low_freq_indices) > 0:
-                low_freq_energy = np.mean(S[low_freq_indices, :])
-                if low_freq_energy > 0.01:  # Threshold for breathing detection
-                    breathing_detected += 1
-        
-        has_breathing = breathing_detected > len(silence_gaps) * 0.3  # 30% of gaps
-        
-        verdict = "REAL AUDIO: Natural breathing detected" if has_breathing else "SUSPICIOUS: No breathing in silence"
+            return _silence_result(0, 0, enough_segments=False)
         
-        return {
-            "silence_gaps_count": len(silence_gaps),
-            "breathing_gaps_detected": breathing_detected,
-            "has_breathing_sounds": has_breathing,
-            "verdict": verdict,
-            "is_fake": not has_breathing
-        }
+        # Calculate silence gaps (end of one interval -> start of the next)
+        gap_starts = intervals[:-1, 1]
+        gap_ends = intervals[1:, 0]
+        long_enough = (gap_ends - gap_starts) / sr > 0.1  # At least 100ms gap
+        silence_gaps = np.stack([gap_starts[long_enough], gap_ends[long_enough]], axis=1)
+        
+        # Analyze silence gaps for low-frequency noise (breathing is typically 100-500 Hz)
+        gap_energies = _gap_band_energies(features, silence_gaps, 100, 500)
+        breathing_detected = int(np.count_nonzero(gap_energies > 0.01))  # Threshold for breathing detection
+        
+        result = _silence_result(len(silence_gaps), breathing_detected)
+        result["gap_breathing_energies"] = [round(float(e), 4) for e in gap_energies]
+        return result
         
     except Exception as e:
         print(f"Error analyzing silence: {e}")
         return None
 
 
-def analyze_audio_full(file_path, is_video=False):
+def analyze_audio_full(file_path, is_video=False, audio=None, streaming=None, features=None):
     """
     Full audio analysis pipeline
+    `audio` lets callers that already demuxed the file (see MediaDemuxer) pass
+    (samples, sample_rate) directly - nothing is written to disk
+    `features` (from compute_audio_features) skips decoding altogether
+    `streaming` forces (True) or disables (False) the bounded-memory blockwise
+    mode; by default it is used for recordings longer than AUDIO_STREAMING_MIN_SECONDS
     """
-    actual_audio_path = file_path
-    temp_file_created = False
+    if features is not None:
+        return _combine_audio_results(
+            analyze_high_frequency_cutoff(file_path, features=features),
+            analyze_silence_patterns(file_path, features=features)
+        )
     
-    # Extract audio if video
-    if is_video:
-        actual_audio_path = extract_audio_from_video(file_path)
-        temp_file_created = True
-        if not actual_audio_path:
+    if audio is None:
+        if streaming is None:
+            streaming = should_stream_audio(probe_media(file_path)["duration_seconds"])
+        if streaming:
+            return analyze_audio_streaming(file_path, is_video=is_video)
+    
+    # Decode once (extracts the soundtrack if video)
+    if audio is None:
+        audio = load_audio(file_path, is_video=is_video)
+        if audio is None and is_video:
             return {"error": "Failed to extract audio from video"}
     
-    # Run all audio checks
-    high_freq_result = analyze_high_frequency_cutoff(actual_audio_path)
-    silence_result = analyze_silence_patterns(actual_audio_path)
+    # One spectrogram shared by every check
+    features = None
+    if audio is not None:
+        try:
+            features = compute_audio_features(*audio)
+        except Exception as e:
+            print(f"Error computing spectrogram: {e}")
     
-    # Cleanup temp audio file
-    if temp_file_created and os.path.exists(actual_audio_path):
-        os.remove(actual_audio_path)
+    # Run all audio checks
+    high_freq_result = None
+    silence_result = None
+    if features is not None:
+        high_freq_result = analyze_high_frequency_cutoff(file_path, features=features)
+        silence_result = analyze_silence_patterns(file_path, features=features)
     
-    # Combine results
+    return _combine_audio_results(high_freq_result, silence_result)
+
+
+def _combine_audio_results(high_freq_result, silence_result):
+    """Combine the individual checks into the overall audio verdict"""
     fake_indicators = 0
     if high_freq_result and high_freq_result.get("is_fake"):
         fake_indicators += 1
@@ -187,6 +292,235 @@ def analyze_audio_full(file_path, is_video=False):
     }
 
 
+def summarize_audio_result(audio_result):
+    """Verdict fields of an audio scan (as shown by the frontend) for an analyze_audio_full result"""
+    is_fake = audio_result.get("is_fake", False)
+    confidence = 0.3 if is_fake else 0.8  # Convert to 0-1 scale
+    
+    return {
+        "verdict": audio_result.get("overall_verdict", "Unknown"),
+        "overall_confidence": confidence,
+        "is_fake": is_fake,
+        "threat_level": "HIGH" if is_fake else "LOW",
+        "audio_analysis": audio_result,
+        "confidence_breakdown": {
+            "Visual": 0,
+            "Audio": (audio_result.get("high_frequency_analysis") or {}).get("is_fake", False) and 20 or 85,
+            "Temporal": 0,
+            "Lip-Sync": 0,
+            "Metadata": 0
+        }
+    }
+
+
+def should_stream_audio(duration_seconds):
+    """Long recordings are analyzed block by block instead of being loaded whole"""
+    return duration_seconds is not None and duration_seconds > AUDIO_STREAMING_MIN_SECONDS
+
+
+class StreamingAudioAnalyzer:
+    """
+    Blockwise version of the high-frequency and silence/breathing checks.
+    
+    Samples are pushed in arbitrary chunks and framed exactly like librosa.stft
+    (n_fft=2048, hop=512, Hann window). Only running aggregates are kept:
+    a fixed-size dB histogram for the high band and the state of the current
+    silence gap, so memory does not depend on the recording length.
+    
+    Unlike the in-memory path, dB values and the 30 dB silence threshold are
+    relative to the loudest frame *seen so far*, so early blocks can be judged
+    against a lower peak than the full file would have.
+    """
+    
+    HIST_MIN_DB = -100.0
+    HIST_MAX_DB = 100.0
+    HIST_STEP_DB = 0.05
+    MAX_FRAMES_PER_BATCH = 256
+    
+    def __init__(self, sr, n_fft=2048, hop_length=512):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.window = librosa.filters.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+        
+        freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+        self.high_freq_rows = np.where(freqs > AUDIO_CUTOFF_FREQ)[0]
+        self.breathing_rows = np.where((freqs > 100) & (freqs < 500))[0]
+        
+        n_bins = int(round((self.HIST_MAX_DB - self.HIST_MIN_DB) / self.HIST_STEP_DB))
+        self.high_freq_hist = np.zeros(n_bins, dtype=np.int64)
+        self.peak_magnitude = 0.0
+        self.peak_mse = 0.0
+        
+        self.frames_seen = 0
+        self.samples_seen = 0
+        self._buffer = np.zeros(0, dtype=np.float32)
+        
+        # Silence gap state machine
+        self._seen_sound = False
+        self._gap_frames = 0
+        self._gap_energy = 0.0
+        self.segment_breaks = 0
+        self.silence_gaps_count = 0
+        self.breathing_gaps_detected = 0
+    
+    def push(self, samples):
+        """Feed the next chunk of mono samples"""
+        samples = np.asarray(samples, dtype=np.float32)
+        self.samples_seen += len(samples)
+        self._buffer = np.concatenate([self._buffer, samples])
+        self._consume()
+    
+    def _consume(self):
+        while len(self._buffer) >= self.n_fft:
+            n_frames = min(1 + (len(self._buffer) - self.n_fft) // self.hop_length, self.MAX_FRAMES_PER_BATCH)
+            used = (n_frames - 1) * self.hop_length + self.n_fft
+            frames = librosa.util.frame(self._buffer[:used], frame_length=self.n_fft, hop_length=self.hop_length)
+            self._process_frames(frames)
+            self._buffer = self._buffer[n_frames * self.hop_length:]
+    
+    def _process_frames(self, frames):
+        self.frames_seen += frames.shape[1]
+        
+        magnitude = np.abs(np.fft.rfft(frames * self.window[:, None], axis=0))
+        mse = np.mean(frames ** 2, axis=0)
+        
+        self.peak_magnitude = max(self.peak_magnitude, float(magnitude.max()))
+        self.peak_mse = max(self.peak_mse, float(mse.max()))
+        
+        # High band: absolute dB histogram, re-referenced to the peak at the end
+        if len(self.high_freq_rows) > 0:
+            band_db = 20.0 * np.log10(np.maximum(1e-5, magnitude[self.high_freq_rows, :]))
+            bins = ((band_db - self.HIST_MIN_DB) / self.HIST_STEP_DB).astype(np.int64)
+            np.clip(bins, 0, len(self.high_freq_hist) - 1, out=bins)
+            self.high_freq_hist += np.bincount(bins.ravel(), minlength=len(self.high_freq_hist))
+        
+        # Silence: same rule as librosa.effects.split(top_db=30), against the running peak
+        frame_db = 10.0 * np.log10(np.maximum(1e-10, mse))
+        threshold_db = 10.0 * np.log10(max(1e-10, self.peak_mse)) - 30
+        silent = (frame_db <= threshold_db).tolist()
+        
+        if len(self.breathing_rows) > 0:
+            breathing_energy = magnitude[self.breathing_rows, :].mean(axis=0).tolist()
+        else:
+            breathing_energy = [0.0] * len(silent)
+        
+        for is_silent, energy in zip(silent, breathing_energy):
+            if is_silent:
+                if self._seen_sound:
+                    self._gap_frames += 1
+                    self._gap_energy += energy
+            else:
+                self._close_gap()
+                self._seen_sound = True
+    
+    def _close_gap(self):
+        """A gap only counts once sound resumes after it (like the split intervals)"""
+        if self._gap_frames > 0:
+            self.segment_breaks += 1
+            gap_duration = self._gap_frames * self.hop_length / self.sr
+            if gap_duration > 0.1:  # At least 100ms gap
+                self.silence_gaps_count += 1
+                if self._gap_energy / self._gap_frames > 0.01:  # Threshold for breathing detection
+                    self.breathing_gaps_detected += 1
+        self._gap_frames = 0
+        self._gap_energy = 0.0
+    
+    def _avg_high_freq_energy(self):
+        if len(self.high_freq_rows) == 0 or not self.high_freq_hist.any():
+            return None
+        peak_db = 20.0 * np.log10(max(1e-5, self.peak_magnitude))
+        centers = self.HIST_MIN_DB + (np.arange(len(self.high_freq_hist)) + 0.5) * self.HIST_STEP_DB
+        relative_db = np.maximum(centers - peak_db, -80.0)
+        return float(np.sum(relative_db * self.high_freq_hist) / np.sum(self.high_freq_hist))
+    
+    def finish(self):
+        """Flush the last partial frame and return the final result"""
+        # Anything beyond the overlap with the last frame is unprocessed audio
+        if len(self._buffer) > self.n_fft - self.hop_length:
+            pad = np.zeros(self.n_fft - len(self._buffer), dtype=np.float32)
+            self._buffer = np.concatenate([self._buffer, pad])
+            self._consume()
+        self._buffer = np.zeros(0, dtype=np.float32)
+        return self.result()
+    
+    def result(self):
+        """Current verdict from everything pushed so far (can be called at any time)"""
+        high_freq_result = None
+        silence_result = None
+        
+        if self.frames_seen > 0:
+            high_freq_result = _high_frequency_result(self._avg_high_freq_energy(), self.sr)
+            silence_result = _silence_result(
+                self.silence_gaps_count,
+                self.breathing_gaps_detected,
+                enough_segments=self.segment_breaks > 0
+            )
+        
+        result = _combine_audio_results(high_freq_result, silence_result)
+        result["streaming"] = True
+        result["processed_seconds"] = round(self.samples_seen / self.sr, 2)
+        return result
+
+
+def _open_audio_stream(file_path, is_video, block_seconds):
+    """
+    Returns (sample_rate, chunk_iterator, close). Audio files are read in
+    fixed-size soundfile blocks; video (or formats libsndfile can't read)
+    are decoded through the demuxer.
+    """
+    if not is_video:
+        try:
+            sr = sf.info(file_path).samplerate
+            blocks = sf.blocks(file_path, blocksize=int(sr * block_seconds), dtype="float32", always_2d=True)
+            return sr, (block.mean(axis=1) for block in blocks), lambda: None
+        except Exception:
+            pass
+    
+    media = MediaDemuxer(file_path, audio_sample_rate=VIDEO_AUDIO_SAMPLE_RATE if is_video else None)
+    if not media.has_audio:
+        media.close()
+        return None, iter(()), lambda: None
+    return media.audio_sample_rate, media.iter_audio(), media.close
+
+
+def stream_audio_analysis(file_path, is_video=False, block_seconds=AUDIO_STREAM_BLOCK_SECONDS):
+    """
+    Generator version of analyze_audio_full for long recordings.
+    Yields a partial result every `block_seconds` of audio and the final one last
+    (marked with "complete": True).
+    """
+    sr, chunks, close = _open_audio_stream(file_path, is_video, block_seconds)
+    if sr is None:
+        yield {"error": "Failed to extract audio from video" if is_video else "Failed to load audio", "complete": True}
+        return
+    
+    analyzer = StreamingAudioAnalyzer(sr)
+    next_report = block_seconds
+    try:
+        for chunk in chunks:
+            analyzer.push(chunk)
+            if analyzer.samples_seen / sr >= next_report:
+                next_report += block_seconds
+                partial = analyzer.result()
+                partial["complete"] = False
+                yield partial
+    finally:
+        close()
+    
+    final = analyzer.finish()
+    final["complete"] = True
+    yield final
+
+
+def analyze_audio_streaming(file_path, is_video=False, block_seconds=AUDIO_STREAM_BLOCK_SECONDS):
+    """Run the streaming analysis to completion and return the final result"""
+    result = None
+    for result in stream_audio_analysis(file_path, is_video=is_video, block_seconds=block_seconds):
+        pass
+    return result
+
+
 # === STANDALONE TESTING ===
 if __name__ == "__main__":
     import tkinter as tk
@@ -0,0 +1,190 @@
+import os
+import sys
+import sqlite3
+import threading
+import numpy as np
+from scipy.ndimage import maximum_filter
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import AUDIO_FINGERPRINT_DB, AUDIO_MATCH_MIN_SIMILARITY, AUDIO_MATCH_MIN_HASHES
+
+# Landmark parameters - expressed in Hz / seconds so clips decoded at
+# different sample rates (44.1k vs 48k re-encodes) produce the same hashes
+FP_MIN_FREQ = 250       # Hz - below this codecs and rooms add too much rumble
+FP_MAX_FREQ = 5000      # Hz - lossy encoders throw away the top of the spectrum
+FREQ_STEP = 25          # Hz per hash frequency unit
+TIME_STEP = 0.064       # seconds per hash time unit
+PEAKS_PER_SECOND = 30
+FAN_OUT = 5             # target peaks paired with each anchor
+MAX_PAIR_DT = 2.0       # seconds
+HOP_LENGTH = 512        # must match compute_audio_features
+
+
+def compute_fingerprint(features):
+    """
+    Spectral-peak (landmark) fingerprint from the shared audio spectrogram.
+    Returns {"hashes": uint32 array, "offsets": int32 array (anchor time units)}.
+    """
+    magnitude = features["magnitude"]
+    freqs = features["freqs"]
+    sr = features["sr"]
+
+    rows = np.where((freqs >= FP_MIN_FREQ) & (freqs <= FP_MAX_FREQ))[0]
+    if len(rows) == 0 or magnitude.shape[1] == 0:
+        return {"hashes": np.zeros(0, dtype=np.uint32), "offsets": np.zeros(0, dtype=np.int32)}
+
+    log_spec = np.log1p(magnitude[rows, :] * 100.0)
+
+    # Local maxima over ~100 Hz x ~100 ms neighbourhoods that stand out from the background
+    bin_hz = freqs[1] - freqs[0]
+    frame_s = HOP_LENGTH / sr
+    size = (max(3, int(100 / bin_hz) | 1), max(3, int(0.1 / frame_s) | 1))
+    is_peak = (log_spec == maximum_filter(log_spec, size=size)) & (log_spec > log_spec.mean() + log_spec.std())
+    peak_rows, peak_frames = np.nonzero(is_peak)
+
+    # Keep the strongest peaks so the density is independent of loudness
+    duration = magnitude.shape[1] * frame_s
+    max_peaks = int(max(1.0, duration) * PEAKS_PER_SECOND)
+    if len(peak_rows) > max_peaks:
+        strongest = np.argpartition(log_spec[peak_rows, peak_frames], -max_peaks)[-max_peaks:]
+        peak_rows, peak_frames = peak_rows[strongest], peak_frames[strongest]
+
+    order = np.argsort(peak_frames, kind="stable")
+    peak_rows, peak_frames = peak_rows[order], peak_frames[order]
+
+    # Parabolic interpolation gives the true peak frequency, not the bin centre,
+    # so the hash does not depend on the bin spacing (i.e. on the sample rate)
+    below = log_spec[np.maximum(peak_rows - 1, 0), peak_frames]
+    centre = log_spec[peak_rows, peak_frames]
+    above = log_spec[np.minimum(peak_rows + 1, len(rows) - 1), peak_frames]
+    curvature = below - 2 * centre + above
+    shift = np.where(curvature < 0, 0.5 * (below - above) / np.where(curvature < 0, curvature, -1), 0.0)
+    peak_hz = freqs[rows][peak_rows] + np.clip(shift, -0.5, 0.5) * bin_hz
+
+    peak_freq = (peak_hz / FREQ_STEP).astype(np.int64)
+    peak_time = (peak_frames * frame_s / TIME_STEP).astype(np.int64)
+
+    # Pair every anchor with the next FAN_OUT peaks inside the target zone
+    max_dt = int(MAX_PAIR_DT / TIME_STEP)
+    hashes = []
+    offsets = []
+    for k in range(1, FAN_OUT + 1):
+        f1, f2 = peak_freq[:-k], peak_freq[k:]
+        t1, dt = peak_time[:-k], peak_time[k:] - peak_time[:-k]
+        valid = (dt > 0) & (dt <= max_dt)
+        hashes.append((f1[valid] << 16) | (f2[valid] << 8) | dt[valid])
+        offsets.append(t1[valid])
+
+    hashes = np.concatenate(hashes).astype(np.uint32)
+    offsets = np.concatenate(offsets).astype(np.int32)
+    return {"hashes": hashes, "offsets": offsets}
+
+
+class AudioFingerprintIndex:
+    """
+    Inverted index (hash -> track, offset) kept in SQLite.
+    A match needs many hashes agreeing on the same time offset, which is what
+    makes it robust to re-encoding while rejecting unrelated clips.
+    """
+
+    def __init__(self, db_path=AUDIO_FINGERPRINT_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS tracks (
+                id INTEGER PRIMARY KEY,
+                content_hash TEXT UNIQUE,
+                filename TEXT,
+                hash_count INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                hash INTEGER NOT NULL,
+                track_id INTEGER NOT NULL,
+                offset INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_fingerprints_hash ON fingerprints(hash);
+        ''')
+        self._conn.commit()
+
+    def add(self, content_hash, filename, fingerprint):
+        """Store the fingerprint of an analyzed clip"""
+        hashes = fingerprint["hashes"]
+        if len(hashes) == 0:
+            return
+
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute(
+                "INSERT OR IGNORE INTO tracks (content_hash, filename, hash_count) VALUES (?, ?, ?)",
+                (content_hash, filename, len(hashes))
+            )
+            if cursor.rowcount == 0:
+                return  # already indexed
+            track_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO fingerprints (hash, track_id, offset) VALUES (?, ?, ?)",
+                zip(hashes.tolist(), [track_id] * len(hashes), fingerprint["offsets"].tolist())
+            )
+            self._conn.commit()
+
+    def find_match(self, fingerprint):
+        """
+        Best matching indexed clip, or None if nothing is similar enough.
+        Returns {"content_hash", "filename", "similarity", "matched_hashes"}.
+        """
+        hashes = fingerprint["hashes"]
+        if len(hashes) < AUDIO_MATCH_MIN_HASHES:
+            return None
+
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS query_hashes (hash INTEGER, offset INTEGER)")
+            cursor.execute("DELETE FROM query_hashes")
+            cursor.executemany(
+                "INSERT INTO query_hashes (hash, offset) VALUES (?, ?)",
+                zip(hashes.tolist(), fingerprint["offsets"].tolist())
+            )
+            cursor.execute('''
+                SELECT f.track_id, f.offset - q.offset AS delta, COUNT(*)
+                FROM query_hashes q JOIN fingerprints f ON f.hash = q.hash
+                GROUP BY f.track_id, delta
+                HAVING COUNT(*) > 1
+            ''')
+            votes = cursor.fetchall()
+            cursor.execute("DELETE FROM query_hashes")
+
+            if not votes:
+                return None
+
+            # Per track: best offset, allowing one time unit of quantization jitter
+            by_track = {}
+            for track_id, delta, count in votes:
+                by_track.setdefault(track_id, {})[delta] = count
+            best_track, best_count = None, 0
+            for track_id, deltas in by_track.items():
+                count = max(
+                    deltas.get(d - 1, 0) + c + deltas.get(d + 1, 0)
+                    for d, c in deltas.items()
+                )
+                if count > best_count:
+                    best_track, best_count = track_id, count
+
+            cursor.execute("SELECT content_hash, filename FROM tracks WHERE id = ?", (best_track,))
+            content_hash, filename = cursor.fetchone()
+
+        # Share of the query that lines up: a known clip with other audio
+        # spliced in scores low, instead of matching the known part fully
+        similarity = best_count / max(1, len(hashes))
+        if best_count < AUDIO_MATCH_MIN_HASHES or similarity < AUDIO_MATCH_MIN_SIMILARITY:
+            return None
+
+        return {
+            "content_hash": content_hash,
+            "filename": filename,
+            "similarity": round(min(1.0, similarity), 4),
+            "matched_hashes": int(best_count)
+        }
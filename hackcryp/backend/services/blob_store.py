@@ -0,0 +1,46 @@
+import os
+import sys
+import hashlib
+import tempfile
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import PROTECTED_BLOB_DIR
+
+
+class BlobStore:
+    """
+    Content-addressed file store: every blob is saved under its SHA-256 digest
+    (sharded as ab/cd/<digest>). Writing the same bytes twice is a no-op, and
+    the digest doubles as a strong ETag when the blob is served.
+    """
+
+    def __init__(self, root=PROTECTED_BLOB_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, data):
+        """Store bytes (one write, atomically renamed into place). Returns the digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.path(digest)
+        if os.path.exists(target):
+            return digest
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
@@ -2,6 +2,8 @@ import cv2
 import torch
 import os
 import sys
+import time
+import threading
 import json
 import numpy as np
 from PIL import Image
@@ -11,7 +13,9 @@ import mediapipe as mp
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import DEEPFAKE_MODEL
+from config import DEEPFAKE_MODEL, CLASSIFIER_BATCH_SIZE
+
+FACE_PADDING = 0.2   # fraction of the face width added around each crop
 
 # --- HARDCODED GROUND TRUTH ---
 HARDCODED_RESULTS = {
@@ -276,26 +280,69 @@ face_detection = mp_face_detection.FaceDetection(
     model_selection=1, 
     min_detection_confidence=0.5
 )
+_detection_lock = threading.Lock()
+
+def _fake_label_id():
+    id2label = model.config.id2label
+    return next((k for k, v in id2label.items() if "fake" in v.lower()), 0)
 
 def get_face_score(pil_image):
     """Get deepfake probability for a single face image"""
+    return get_face_scores([pil_image])[0]
+
+def get_face_scores(images, batch_size=CLASSIFIER_BATCH_SIZE):
+    """
+    Deepfake probability (0-100) for a list of face images (PIL or RGB arrays),
+    classified `batch_size` at a time in single model passes.
+    """
     if processor is None or model is None:
-        return 50.0  # Default uncertain score
+        return [50.0] * len(images)  # Default uncertain score
     
     try:
-        inputs = processor(pil_image, return_tensors="pt")
-        with torch.no_grad():
-            outputs = model(**inputs)
-            probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-        
-        id2label = model.config.id2label
-        fake_id = next((k for k, v in id2label.items() if "fake" in v.lower()), 0)
-        
-        fake_prob = probs[0][fake_id].item() * 100
-        return fake_prob
+        fake_id = _fake_label_id()
+        scores = []
+        for start in range(0, len(images), batch_size):
+            inputs = processor(images[start:start + batch_size], return_tensors="pt")
+            with torch.no_grad():
+                outputs = model(**inputs)
+                probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
+            scores.extend((probs[:, fake_id] * 100).tolist())
+        return scores
     except Exception as e:
         print(f"   ⚠️ Error in face scoring: {e}")
-        return 50.0
+        return [50.0] * len(images)
+
+def detect_face_boxes(img_rgb):
+    """Padded (x1, y1, x2, y2) boxes of the faces MediaPipe finds in an RGB image"""
+    # One MediaPipe graph is shared by all request threads
+    with _detection_lock:
+        results = face_detection.process(img_rgb)
+    if not results.detections:
+        return []
+    
+    h, w, _ = img_rgb.shape
+    boxes = []
+    for detection in results.detections:
+        bbox = detection.location_data.relative_bounding_box
+        x = int(bbox.xmin * w)
+        y = int(bbox.ymin * h)
+        bw = int(bbox.width * w)
+        bh = int(bbox.height * h)
+        
+        # Add padding around face
+        padding = int(bw * FACE_PADDING)
+        x1 = max(0, x - padding)
+        y1 = max(0, y - padding)
+        x2 = min(w, x + bw + padding)
+        y2 = min(h, y + bh + padding)
+        
+        if x2 > x1 and y2 > y1:
+            boxes.append((x1, y1, x2, y2))
+    return boxes
+
+def crop_faces(img_rgb):
+    """Padded crops of the faces MediaPipe finds in an RGB image (views, not copies)"""
+    return [img_rgb[y1:y2, x1:x2] for x1, y1, x2, y2 in detect_face_boxes(img_rgb)]
 
 def extract_and_scan_faces(image_path):
     """Extract faces from image and return max deepfake score"""
@@ -305,44 +352,51 @@ def extract_and_scan_faces(image_path):
             return 50.0
         
         img_rgb = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
-        results = face_detection.process(img_rgb)
+        faces = crop_faces(img_rgb)
         
         # No face detected - scan full image
-        if not results.detections:
+        if not faces:
             print("   ⚠️ No face detected. Scanning full image.")
             return get_face_score(Image.fromarray(img_rgb))
         
-        max_fake_score = 0.0
-        h, w, _ = img_cv.shape
-        
-        # Scan each detected face
-        for detection in results.detections:
-            bbox = detection.location_data.relative_bounding_box
-            x = int(bbox.xmin * w)
-            y = int(bbox.ymin * h)
-            bw = int(bbox.width * w)
-            bh = int(bbox.height * h)
-            
-            # Add padding around face
-            padding = int(bw * 0.2)
-            x1 = max(0, x - padding)
-            y1 = max(0, y - padding)
-            x2 = min(w, x + bw + padding)
-            y2 = min(h, y + bh + padding)
-            
-            face_crop = img_rgb[y1:y2, x1:x2]
-            if face_crop.size == 0:
-                continue
-            
-            score = get_face_score(Image.fromarray(face_crop))
-            if score > max_fake_score:
-                max_fake_score = score
-        
-        return max_fake_score
+        # Scan all detected faces in one batch
+        return max(get_face_scores([Image.fromarray(face) for face in faces]))
     except Exception as e:
         print(f"   ⚠️ Error in face extraction: {e}")
         return 50.0
 
+def score_frame_batch(frames):
+    """
+    Deepfake score (0-100, max over faces) for every frame of an (N, H, W, 3)
+    uint8 RGB batch. Faces are detected frame by frame (MediaPipe has no batch
+    API), then all face crops - or whole frames where no face was found - go
+    through the classifier together.
+    Returns (scores, faces_per_frame, timing_ms).
+    """
+    t0 = time.perf_counter()
+    images = []
+    owners = []
+    faces_per_frame = []
+    for index, frame in enumerate(frames):
+        faces = crop_faces(frame)
+        faces_per_frame.append(len(faces))
+        for face in faces or [frame]:
+            images.append(Image.fromarray(face))
+            owners.append(index)
+    t1 = time.perf_counter()
+    
+    crop_scores = get_face_scores(images)
+    scores = [0.0] * len(frames)
+    for owner, score in zip(owners, crop_scores):
+        scores[owner] = max(scores[owner], score)
+    t2 = time.perf_counter()
+    
+    timing_ms = {
+        "face_detection": round((t1 - t0) * 1000, 1),
+        "classification": round((t2 - t1) * 1000, 1)
+    }
+    return scores, faces_per_frame, timing_ms
+
 def analyze_image_deepfake(image_path):
     """
     Main function for image deepfake detection - returns format for unified analyzer
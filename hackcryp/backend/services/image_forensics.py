@@ -25,12 +25,11 @@ def get_ela_analysis(image_path):
     try:
         original = cv2.imread(image_path)
         
-        # Compress to temp file
-        temp_file = "temp_uploads/temp_ela.jpg"
-        cv2.imwrite(temp_file, original, [cv2.IMWRITE_JPEG_QUALITY, ELA_JPEG_QUALITY])
+        # Recompress in memory (no shared temp file, so parallel scans don't collide)
+        _, encoded = cv2.imencode('.jpg', original, [cv2.IMWRITE_JPEG_QUALITY, ELA_JPEG_QUALITY])
         
-        # Read back and calculate difference
-        compressed = cv2.imread(temp_file)
+        # Decode and calculate difference
+        compressed = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
         diff = cv2.absdiff(original, compressed)
         
         # Enhance heatmap for visibility
@@ -44,10 +43,6 @@ def get_ela_analysis(image_path):
         _, buffer = cv2.imencode('.jpg', heatmap)
         heatmap_base64 = base64.b64encode(buffer).decode('utf-8')
         
-        # Cleanup
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-        
         # Verdict
         verdict = "SUSPICIOUS: High manipulation detected" if score > 15 else "NORMAL: Low manipulation"
         is_fake = score > 15
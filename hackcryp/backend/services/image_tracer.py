@@ -0,0 +1,250 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+import cv2
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    TRACE_INDEX_DIR, TRACE_MAX_DISTANCE, TRACE_MAX_MATCHES,
+    IMAGE_NEAR_DUPLICATE_CACHE, IMAGE_NEAR_DUPLICATE_DISTANCE, IMAGE_NEAR_DUPLICATE_DHASH_DISTANCE
+)
+
+
+# --- PERCEPTUAL HASHES (64-bit) ---
+
+_BIT_WEIGHTS = (np.uint64(1) << np.arange(63, -1, -1, dtype=np.uint64))
+
+
+def _bits_to_uint64(bits):
+    """Pack 64 booleans (row-major) into one uint64"""
+    return np.uint64(np.sum(_BIT_WEIGHTS[bits.ravel()], dtype=np.uint64))
+
+
+def compute_phash(gray):
+    """DCT hash: low-frequency 8x8 DCT block compared with its median"""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low_freq = cv2.dct(small)[:8, :8]
+    # DC term excluded from the median (it only reflects overall brightness)
+    return _bits_to_uint64(low_freq > np.median(low_freq.ravel()[1:]))
+
+
+def compute_dhash(gray):
+    """Gradient hash: is each pixel brighter than its right neighbour (9x8 thumbnail)"""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return _bits_to_uint64(small[:, 1:] > small[:, :-1])
+
+
+def compute_image_hashes(image):
+    """
+    pHash + dHash for a BGR/grayscale array or an image path.
+    Returns None if the image can't be read.
+    """
+    if isinstance(image, str):
+        image = cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return {"phash": compute_phash(image), "dhash": compute_dhash(image)}
+
+
+def hamming_distances(hashes, query):
+    """Vectorized popcount(hashes XOR query) over a uint64 array"""
+    diff = np.bitwise_xor(hashes, np.uint64(query))
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(diff)
+    # numpy < 2.0: count bits byte by byte
+    return np.unpackbits(diff.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+# --- INDEX ---
+
+class PerceptualHashIndex:
+    """
+    Append-only index of image hashes.
+
+    Hashes live in a memory-mapped (N, 2) uint64 file [phash, dhash] so a query
+    is one vectorized XOR + popcount over contiguous memory (a million rows
+    is a few milliseconds). Per-image details are in a SQLite table keyed by
+    row number and are only read for the rows that matched.
+    """
+
+    INITIAL_CAPACITY = 4096
+    MAX_LOOKUP_ROWS = 5000
+
+    def __init__(self, index_dir=TRACE_INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        self.hash_path = os.path.join(index_dir, "hashes.u64")
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(os.path.join(index_dir, "images.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS images (
+                row INTEGER PRIMARY KEY,
+                filename TEXT,
+                source TEXT,
+                content_hash TEXT,
+                added_at REAL
+            )
+        ''')
+        self._conn.commit()
+
+        self.count = self._conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+        capacity = self.INITIAL_CAPACITY
+        if os.path.exists(self.hash_path):
+            capacity = max(capacity, os.path.getsize(self.hash_path) // 16)
+        self._open(capacity)
+
+    def _open(self, capacity):
+        mode = "r+" if os.path.exists(self.hash_path) else "w+"
+        if mode == "r+" and os.path.getsize(self.hash_path) < capacity * 16:
+            with open(self.hash_path, "r+b") as f:
+                f.truncate(capacity * 16)
+        self.capacity = capacity
+        self.hashes = np.memmap(self.hash_path, dtype=np.uint64, mode=mode, shape=(capacity, 2))
+
+    def add(self, hashes, filename, source, content_hash=None):
+        """Append one image; returns its row number"""
+        with self._lock:
+            if self.count >= self.capacity:
+                self.hashes.flush()
+                del self.hashes
+                self._open(self.capacity * 2)
+
+            row = self.count
+            self.hashes[row, 0] = hashes["phash"]
+            self.hashes[row, 1] = hashes["dhash"]
+            self.hashes.flush()
+
+            self._conn.execute(
+                "INSERT INTO images (row, filename, source, content_hash, added_at) VALUES (?, ?, ?, ?, ?)",
+                (row, filename, source, content_hash, time.time())
+            )
+            self._conn.commit()
+            self.count += 1
+            return row
+
+    def search(self, hashes, max_distance=TRACE_MAX_DISTANCE, limit=TRACE_MAX_MATCHES, source=None):
+        """
+        Closest indexed images by pHash Hamming distance (ties broken by dHash).
+        Returns a list of match dicts, nearest first.
+        """
+        with self._lock:
+            n = self.count
+            if n == 0:
+                return []
+            phash_distance = hamming_distances(self.hashes[:n, 0], hashes["phash"])
+            candidates = np.flatnonzero(phash_distance <= max_distance)
+            if len(candidates) == 0:
+                return []
+            dhash_distance = hamming_distances(self.hashes[candidates, 1], hashes["dhash"])
+
+            # Nearest first; only the closest few thousand are looked up in SQLite
+            order = np.lexsort((dhash_distance, phash_distance[candidates]))[:self.MAX_LOOKUP_ROWS]
+            rows = candidates[order]
+            distances = dict(zip(rows.tolist(), zip(phash_distance[rows].tolist(), dhash_distance[order].tolist())))
+
+            query = "SELECT row, filename, source, content_hash, added_at FROM images WHERE row IN ({})".format(
+                ",".join("?" * len(rows))
+            )
+            params = rows.tolist()
+            if source:
+                query += " AND source = ?"
+                params.append(source)
+            records = {r[0]: r for r in self._conn.execute(query, params)}
+
+        matches = []
+        for row in rows.tolist():
+            if row not in records:
+                continue
+            _, filename, src, content_hash, added_at = records[row]
+            phash_d, dhash_d = distances[row]
+            matches.append({
+                "filename": filename,
+                "source": src,
+                "content_hash": content_hash,
+                "phash_distance": int(phash_d),
+                "dhash_distance": int(dhash_d),
+                "similarity": round(1 - phash_d / 64, 4),
+                "first_seen": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(added_at))
+            })
+            if len(matches) >= limit:
+                break
+        return matches
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_trace_index():
+    """Shared index instance (opened on first use)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PerceptualHashIndex()
+        return _index
+
+
+def index_image(image_path, filename, source, content_hash=None, hashes=None):
+    """Add a scanned/protected image to the provenance index. Returns its hashes or None."""
+    try:
+        if hashes is None:
+            hashes = compute_image_hashes(image_path)
+        if hashes is None:
+            return None
+        get_trace_index().add(hashes, filename, source, content_hash)
+        return hashes
+    except Exception as e:
+        print(f"   ⚠️ Could not index image for tracing: {e}")
+        return None
+
+
+def find_near_duplicate_scans(hashes):
+    """
+    Earlier scans that are visually the same image, nearest first. Both hashes
+    must be close: pHash alone tolerates local edits such as a swapped face.
+    Empty when the near-duplicate cache is disabled.
+    """
+    if not IMAGE_NEAR_DUPLICATE_CACHE or hashes is None:
+        return []
+    try:
+        matches = get_trace_index().search(
+            hashes, max_distance=IMAGE_NEAR_DUPLICATE_DISTANCE, limit=5, source="scan"
+        )
+        return [m for m in matches if m["dhash_distance"] <= IMAGE_NEAR_DUPLICATE_DHASH_DISTANCE]
+    except Exception as e:
+        print(f"   ⚠️ Near-duplicate lookup failed: {e}")
+        return []
+
+
+def trace_image_provenance(file_path, filename):
+    """
+    Find earlier versions of an image (re-saved, resized, re-compressed, protected).
+    The queried image itself is not added to the index.
+    """
+    hashes = compute_image_hashes(file_path)
+    if hashes is None:
+        raise ValueError("Could not read image")
+
+    start = time.perf_counter()
+    index = get_trace_index()
+    matches = index.search(hashes)
+    search_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "filename": filename,
+        "phash": f"{int(hashes['phash']):016x}",
+        "dhash": f"{int(hashes['dhash']):016x}",
+        "matches": matches,
+        "is_known": len(matches) > 0,
+        "closest_match": matches[0] if matches else None,
+        "indexed_images": index.count,
+        "search_time_ms": round(search_ms, 3)
+    }
@@ -4,6 +4,7 @@ import sys
 import mediapipe as mp
 from scipy.spatial import distance as dist
 import time
+import threading
 
 
 # Add parent directory to path for imports
@@ -48,12 +49,25 @@ HARDCODED_VIDEO_RESULTS = {
 
 # MediaPipe Face Mesh
 mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(
-    max_num_faces=1,
-    refine_landmarks=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+
+def create_face_mesh():
+    """New Face Mesh graph (it tracks across frames, so each live stream needs its own)"""
+    return mp_face_mesh.FaceMesh(
+        max_num_faces=1,
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+# Face Mesh graphs are not thread-safe: every thread that analyzes video gets its own
+_thread_meshes = threading.local()
+
+def thread_face_mesh():
+    """Face Mesh graph owned by the calling thread"""
+    mesh = getattr(_thread_meshes, "mesh", None)
+    if mesh is None:
+        mesh = _thread_meshes.mesh = create_face_mesh()
+    return mesh
 
 
 # Eye landmark indices for MediaPipe Face Mesh
@@ -64,6 +78,7 @@ RIGHT_EYE = [362, 385, 387, 263, 373, 380]
 # Improved thresholds
 EAR_THRESHOLD = 0.21
 CONSEC_FRAMES = 3
+DEFAULT_FPS = 30.0   # assumed when the container does not declare a frame rate
 
 
 def calculate_ear(eye_points, landmarks):
@@ -74,11 +89,134 @@ def calculate_ear(eye_points, landmarks):
     return (A + B) / (2.0 * C)
 
 
-def analyze_blink_rate(video_path):
+class BlinkTracker:
+    """
+    Frame-by-frame blink counter.
+    Frames can come from cv2.VideoCapture or from the shared MediaDemuxer.
+    """
+
+    def __init__(self, mesh=None):
+        self.mesh = mesh or thread_face_mesh()
+        self.total_blinks = 0
+        self.blink_counter = 0
+        self.frame_count = 0
+        self.frames_with_face = 0
+        self.start_time = time.time()
+
+    def process_frame(self, frame):
+        """Update blink state with one BGR frame. Returns the average EAR (or None if no face)."""
+        self.frame_count += 1
+        h, w, c = frame.shape
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        results = self.mesh.process(rgb_frame)
+
+        if not results.multi_face_landmarks:
+            return None
+
+        self.frames_with_face += 1
+        avg_ear = None
+
+        for face_landmarks in results.multi_face_landmarks:
+            landmarks = [(int(pt.x * w), int(pt.y * h)) for pt in face_landmarks.landmark]
+
+            left_ear = calculate_ear(LEFT_EYE, landmarks)
+            right_ear = calculate_ear(RIGHT_EYE, landmarks)
+            avg_ear = (left_ear + right_ear) / 2.0
+
+            if avg_ear < EAR_THRESHOLD:
+                self.blink_counter += 1
+            else:
+                if self.blink_counter >= CONSEC_FRAMES:
+                    self.total_blinks += 1
+                    print(f"   👁️ Blink detected at frame {self.frame_count}")
+                self.blink_counter = 0
+
+        return avg_ear
+
+    def summary(self, elapsed_time=None):
+        """Build the blink-rate verdict from the frames seen so far"""
+        if elapsed_time is None:
+            elapsed_time = time.time() - self.start_time
+        if elapsed_time < 0.1:
+            elapsed_time = 0.1
+
+        total_blinks = self.total_blinks
+        frame_count = self.frame_count
+        frames_with_face = self.frames_with_face
+
+        final_bpm = (total_blinks / elapsed_time) * 60
+
+        # IMPROVED verdict logic based on real data
+        if frames_with_face < frame_count * 0.3:
+            verdict = "INCONCLUSIVE: Face not consistently detected"
+            is_fake = False
+            threat_level = "UNKNOWN"
+            temporal_confidence = 50
+        elif final_bpm > 60:
+            verdict = "FAKE: Unnatural Blink Rate (Glitching)"
+            is_fake = True
+            threat_level = "HIGH"
+            temporal_confidence = 15
+        elif final_bpm < 5:
+            verdict = "FAKE: No Natural Blinking (Frozen Face)"
+            is_fake = True
+            threat_level = "HIGH"
+            temporal_confidence = 20
+        elif 5 <= final_bpm < 10:
+            verdict = "SUSPICIOUS: Very Low Blink Rate"
+            is_fake = False
+            threat_level = "MEDIUM"
+            temporal_confidence = 55
+        elif 10 <= final_bpm <= 40:
+            verdict = "REAL: Natural Human Blinking"
+            is_fake = False
+            threat_level = "LOW"
+            temporal_confidence = 85
+        elif 40 < final_bpm <= 60:
+            verdict = "SUSPICIOUS: High Blink Rate (Possible Stress)"
+            is_fake = False
+            threat_level = "MEDIUM"
+            temporal_confidence = 60
+        else:
+            verdict = "INCONCLUSIVE: Unable to determine"
+            is_fake = False
+            threat_level = "UNKNOWN"
+            temporal_confidence = 50
+
+        confidence = "HIGH" if (final_bpm < 5 or final_bpm > 60) else "MEDIUM" if (final_bpm < 10 or final_bpm > 40) else "HIGH"
+
+        return {
+            "total_blinks": total_blinks,
+            "blink_rate_bpm": round(final_bpm, 2),
+            "verdict": verdict,
+            "is_fake": is_fake,
+            "duration_seconds": round(elapsed_time, 2),
+            "total_frames": frame_count,
+            "frames_with_face": frames_with_face,
+            "threat_level": threat_level,
+            "confidence": confidence,
+            "temporal_confidence": temporal_confidence
+        }
+
+
+def _capture_frames(cap):
+    """Yield frames from an opened cv2.VideoCapture"""
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame
+
+
+def analyze_blink_rate(video_path, frames=None, fps=None):
     """
     Analyze video for blink rate and detect deepfakes
     Real humans: 10-40 blinks/min
     Fake videos: Often > 60 BPM (glitching) or < 5 BPM (frozen)
+
+    `frames` can be an iterable of BGR frames (e.g. MediaDemuxer.frames()) so the
+    container is only decoded once; otherwise the file is opened with OpenCV.
+    Blinks are counted per minute of video (frames / `fps`), not of processing time.
     """
     if not os.path.exists(video_path):
         return {"error": "File not found"}
@@ -113,121 +251,48 @@ def analyze_blink_rate(video_path):
     else:
         print(f"   ⚠️ NO MATCH - Running actual analysis")
     
-    cap = cv2.VideoCapture(video_path)
-    
-    if not cap.isOpened():
-        return {"error": "Could not open video"}
+    cap = None
+    if frames is None:
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return {"error": "Could not open video"}
+        frames = _capture_frames(cap)
+        fps = fps or cap.get(cv2.CAP_PROP_FPS)
     
-    total_blinks = 0
-    blink_counter = 0
-    start_time = time.time()
-    frame_count = 0
-    frames_with_face = 0
+    tracker = BlinkTracker()
     
     print("   🎬 Processing video frames...")
     
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        frame_count += 1
-        h, w, c = frame.shape
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb_frame)
-        
-        if results.multi_face_landmarks:
-            frames_with_face += 1
-            
-            for face_landmarks in results.multi_face_landmarks:
-                landmarks = [(int(pt.x * w), int(pt.y * h)) for pt in face_landmarks.landmark]
-                
-                left_ear = calculate_ear(LEFT_EYE, landmarks)
-                right_ear = calculate_ear(RIGHT_EYE, landmarks)
-                avg_ear = (left_ear + right_ear) / 2.0
-                
-                if avg_ear < EAR_THRESHOLD:
-                    blink_counter += 1
-                else:
-                    if blink_counter >= CONSEC_FRAMES:
-                        total_blinks += 1
-                        print(f"   👁️ Blink detected at frame {frame_count}")
-                    blink_counter = 0
-    
-    cap.release()
-    cv2.destroyAllWindows()
+    for frame in frames:
+        tracker.process_frame(frame)
     
-    elapsed_time = time.time() - start_time
-    if elapsed_time < 0.1:
-        elapsed_time = 0.1
+    if cap is not None:
+        cap.release()
+        cv2.destroyAllWindows()
     
-    final_bpm = (total_blinks / elapsed_time) * 60
-    
-    # IMPROVED verdict logic based on real data
-    if frames_with_face < frame_count * 0.3:
-        verdict = "INCONCLUSIVE: Face not consistently detected"
-        is_fake = False
-        threat_level = "UNKNOWN"
-        temporal_confidence = 50
-    elif final_bpm > 60:
-        verdict = "FAKE: Unnatural Blink Rate (Glitching)"
-        is_fake = True
-        threat_level = "HIGH"
-        temporal_confidence = 15
-    elif final_bpm < 5:
-        verdict = "FAKE: No Natural Blinking (Frozen Face)"
-        is_fake = True
-        threat_level = "HIGH"
-        temporal_confidence = 20
-    elif 5 <= final_bpm < 10:
-        verdict = "SUSPICIOUS: Very Low Blink Rate"
-        is_fake = False
-        threat_level = "MEDIUM"
-        temporal_confidence = 55
-    elif 10 <= final_bpm <= 40:
-        verdict = "REAL: Natural Human Blinking"
-        is_fake = False
-        threat_level = "LOW"
-        temporal_confidence = 85
-    elif 40 < final_bpm <= 60:
-        verdict = "SUSPICIOUS: High Blink Rate (Possible Stress)"
-        is_fake = False
-        threat_level = "MEDIUM"
-        temporal_confidence = 60
-    else:
-        verdict = "INCONCLUSIVE: Unable to determine"
-        is_fake = False
-        threat_level = "UNKNOWN"
-        temporal_confidence = 50
-    
-    confidence = "HIGH" if (final_bpm < 5 or final_bpm > 60) else "MEDIUM" if (final_bpm < 10 or final_bpm > 40) else "HIGH"
-    
-    return {
-        "total_blinks": total_blinks,
-        "blink_rate_bpm": round(final_bpm, 2),
-        "verdict": verdict,
-        "is_fake": is_fake,
-        "duration_seconds": round(elapsed_time, 2),
-        "total_frames": frame_count,
-        "frames_with_face": frames_with_face,
-        "threat_level": threat_level,
-        "confidence": confidence,
-        "temporal_confidence": temporal_confidence
-    }
+    return tracker.summary(tracker.frame_count / (fps or DEFAULT_FPS))
 
 
-def analyze_video_full(video_path):
+def analyze_video_full(video_path, frames=None, fps=None):
     """
     Complete video analysis matching frontend UI format
     Returns: Overview, Primary Findings, Confidence Breakdown, Evidence Summary
     """
-    liveness_result = analyze_blink_rate(video_path)
+    liveness_result = analyze_blink_rate(video_path, frames=frames, fps=fps)
     
     print(f"   🎬 Liveness result received: is_fake={liveness_result.get('is_fake')}, verdict={liveness_result.get('verdict')}")
     
     if "error" in liveness_result:
         return liveness_result
-    
+
+    return build_video_report(liveness_result, video_path)
+
+
+def build_video_report(liveness_result, video_path):
+    """
+    Turn a blink/liveness result into the full report format.
+    Also used for partial and final verdicts of streamed videos (BlinkTracker.summary()).
+    """
     # USE LIVENESS RESULT DIRECTLY FOR HARDCODED FILES
     is_fake = liveness_result.get("is_fake", False)
     threat_level = liveness_result.get("threat_level", "MEDIUM")
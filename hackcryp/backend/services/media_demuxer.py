@@ -0,0 +1,162 @@
+import os
+import sys
+import av
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import VIDEO_AUDIO_SAMPLE_RATE
+
+
+class MediaDemuxer:
+    """
+    Opens a media container once and feeds both analysis branches from it.
+
+    Video frames are yielded as BGR arrays (same layout as cv2.VideoCapture)
+    while the audio packets found along the way are decoded to float32 PCM in
+    memory, so the audio branch never needs a temporary WAV file.
+    """
+
+    def __init__(self, source, audio_sample_rate=VIDEO_AUDIO_SAMPLE_RATE):
+        # `source` may be a path or a readable file-like object (e.g. a pipe)
+        # audio_sample_rate=None keeps the native rate of the audio stream
+        self.source = source
+        self.container = av.open(source)
+
+        self.video_stream = self.container.streams.video[0] if self.container.streams.video else None
+        self.audio_stream = self.container.streams.audio[0] if self.container.streams.audio else None
+
+        self.audio_sample_rate = audio_sample_rate
+        if self.audio_sample_rate is None and self.audio_stream is not None:
+            self.audio_sample_rate = self.audio_stream.rate
+
+        self.fps = float(self.video_stream.average_rate) if self.video_stream and self.video_stream.average_rate else 0.0
+        self.duration_seconds = self.container.duration / av.time_base if self.container.duration else None
+        self.frames_read = 0
+
+        self._audio_chunks = []
+        self._audio_done = False
+        self._resampler = None
+
+    @property
+    def has_video(self):
+        return self.video_stream is not None
+
+    @property
+    def has_audio(self):
+        return self.audio_stream is not None
+
+    def _decode_audio(self, frame):
+        """Resample an audio frame and return it as mono float32 samples."""
+        if self._resampler is None:
+            # Keep the source layout and downmix ourselves (same as librosa.to_mono)
+            self._resampler = av.AudioResampler(format="fltp", rate=self.audio_sample_rate)
+
+        chunks = []
+        for out in self._resampler.resample(frame):
+            samples = out.to_ndarray()
+            chunks.append(samples.mean(axis=0, dtype=np.float32) if samples.ndim > 1 else samples)
+        return chunks
+
+    def _flush_audio(self):
+        chunks = []
+        if self._resampler is not None:
+            chunks = self._decode_audio(None)
+        self._audio_done = True
+        return chunks
+
+    def iter_packets(self):
+        """
+        Single demux pass over the container.
+        Yields ("video", bgr_frame) and ("audio", mono_float32_chunk) items in stream order.
+        """
+        streams = [s for s in (self.video_stream, self.audio_stream) if s is not None]
+        if not streams:
+            return
+
+        for packet in self.container.demux(*streams):
+            if packet.stream is self.video_stream:
+                for frame in packet.decode():
+                    self.frames_read += 1
+                    yield "video", frame.to_ndarray(format="bgr24")
+            elif packet.stream is self.audio_stream:
+                for frame in packet.decode():
+                    for chunk in self._decode_audio(frame):
+                        yield "audio", chunk
+
+        for chunk in self._flush_audio():
+            yield "audio", chunk
+
+    def frames(self, audio_sink=None):
+        """
+        Yield video frames (BGR) while handling the audio found in the same pass.
+        Audio chunks go to `audio_sink` (e.g. StreamingAudioAnalyzer.push) if given,
+        otherwise they are collected so `audio()` returns without decoding again.
+        """
+        sink = audio_sink or self._audio_chunks.append
+        for kind, data in self.iter_packets():
+            if kind == "video":
+                yield data
+            else:
+                sink(data)
+
+    def iter_audio(self):
+        """Audio-only demux from the start of the container, yielding mono float32 chunks"""
+        if not self.has_audio:
+            return
+
+        self._resampler = None
+        self.container.seek(0)
+        for packet in self.container.demux(self.audio_stream):
+            for frame in packet.decode():
+                for chunk in self._decode_audio(frame):
+                    yield chunk
+        for chunk in self._flush_audio():
+            yield chunk
+
+    def feed_audio(self, audio_sink):
+        """Push the whole audio track to `audio_sink`, unless frames() already did it"""
+        if self._audio_done:
+            return
+        for chunk in self.iter_audio():
+            audio_sink(chunk)
+
+    def audio(self):
+        """
+        Return (samples, sample_rate) for the audio track, or None if there is none.
+        Uses the PCM collected by `frames()`; otherwise runs an audio-only demux.
+        """
+        if not self.has_audio:
+            return None
+
+        if not self._audio_done:
+            self._audio_chunks = list(self.iter_audio())
+
+        if not self._audio_chunks:
+            return np.zeros(0, dtype=np.float32), self.audio_sample_rate
+
+        return np.concatenate(self._audio_chunks).astype(np.float32, copy=False), self.audio_sample_rate
+
+    def close(self):
+        self.container.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def probe_media(file_path):
+    """Quick container probe - which streams are present, without decoding anything"""
+    try:
+        with av.open(file_path) as container:
+            return {
+                "has_video": len(container.streams.video) > 0,
+                "has_audio": len(container.streams.audio) > 0,
+                "duration_seconds": round(container.duration / av.time_base, 2) if container.duration else None
+            }
+    except Exception as e:
+        print(f"Error probing media: {e}")
+        return {"has_video": False, "has_audio": False, "duration_seconds": None}
@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import sqlite3
+import threading
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import PROTECTION_DB, PROTECTION_RECORDS_JSON
+
+RECORD_FIELDS = (
+    "original_filename", "protected_filename", "original_hash",
+    "protected_hash", "protection_timestamp", "secret_key", "strength"
+)
+INSERT_SQL = "INSERT INTO protections ({}) VALUES ({})".format(
+    ", ".join(RECORD_FIELDS), ", ".join("?" * len(RECORD_FIELDS))
+)
+
+
+class ProtectionRegistry:
+    """
+    NoiseNet protection records in SQLite, indexed by protected hash,
+    original hash and protected filename. Lookups are index seeks and
+    adding a record is a single-row insert, however large the registry gets.
+    """
+
+    def __init__(self, db_path=PROTECTION_DB, legacy_json=PROTECTION_RECORDS_JSON):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS protections (
+                id INTEGER PRIMARY KEY,
+                original_filename TEXT,
+                protected_filename TEXT,
+                original_hash TEXT,
+                protected_hash TEXT,
+                protection_timestamp REAL,
+                secret_key INTEGER,
+                strength REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_protected_hash ON protections(protected_hash);
+            CREATE INDEX IF NOT EXISTS idx_original_hash ON protections(original_hash);
+            CREATE INDEX IF NOT EXISTS idx_protected_filename ON protections(protected_filename);
+        ''')
+        self._conn.commit()
+
+        if legacy_json and self.count() == 0:
+            self._import_json(legacy_json)
+
+    def _import_json(self, json_path):
+        """One-time migration of the old protection_records.json list"""
+        if not os.path.exists(json_path):
+            return
+        try:
+            with open(json_path, 'r') as f:
+                records = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Could not read {json_path}: {e}")
+            return
+
+        self.add_many(records)
+        print(f"   📥 Imported {len(records)} protection records from {json_path}")
+
+    def add(self, record):
+        """Store one protection record (dict with RECORD_FIELDS)"""
+        with self._lock:
+            self._conn.execute(INSERT_SQL, tuple(record.get(field) for field in RECORD_FIELDS))
+            self._conn.commit()
+
+    def add_many(self, records):
+        """Store a batch of records in one transaction"""
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    INSERT_SQL,
+                    [tuple(record.get(field) for field in RECORD_FIELDS) for record in records]
+                )
+
+    def _find_one(self, column, value):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(RECORD_FIELDS)} FROM protections WHERE {column} = ? ORDER BY id DESC LIMIT 1",
+                (value,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def find_by_protected_hash(self, protected_hash):
+        return self._find_one("protected_hash", protected_hash)
+
+    def find_by_original_hash(self, original_hash):
+        return self._find_one("original_hash", original_hash)
+
+    def find_by_protected_filename(self, protected_filename):
+        return self._find_one("protected_filename", protected_filename)
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM protections").fetchone()[0]
@@ -0,0 +1,133 @@
+"""
+Scan history file (content_hash -> result) shared by the API server and the
+batch CLI (python -m deepfake).
+
+Both processes may update the file at the same time, so every
+read-modify-write cycle holds an OS-level lock on a sidecar ".lock" file and
+each writer replaces the history through its own temp file. Readers that
+don't take the lock still only ever see a complete file.
+
+Every update rewrites the whole JSON file, so adding N results one at a time
+costs O(N^2) over the life of the history. Callers batch updates (the CLI
+flushes every SCAN_CLI_FLUSH_EVERY results, /api/scan/batch every
+SCAN_BATCH_HISTORY_EVERY); a history of several hundred thousand scans
+would need a SQLite store like protection_registry instead.
+"""
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+READ_ATTEMPTS = 3   # a non-replacing writer (older builds) may be mid-write
+
+
+class HistoryReadError(Exception):
+    """The history file exists but is not valid JSON; writing it back would lose every scan in it"""
+
+
+def _lock_file(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        return
+    lock_file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # LK_LOCK gives up after ~10 seconds; keep waiting for the other writer
+            continue
+
+
+def _unlock_file(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        return
+    lock_file.seek(0)
+    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class HistoryStore:
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+        # flock is per open file, so threads of one process also need a lock of their own
+        self._thread_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Exclusive access to the history file across threads and processes"""
+        with self._thread_lock:
+            with open(self.lock_path, "a+b") as lock_file:
+                _lock_file(lock_file)
+                try:
+                    yield
+                finally:
+                    _unlock_file(lock_file)
+
+    def read(self):
+        """History contents ({} when missing); raises HistoryReadError if the file is unreadable"""
+        for attempt in range(READ_ATTEMPTS):
+            if not os.path.exists(self.path):
+                return {}
+            try:
+                with open(self.path, "r") as f:
+                    return json.load(f)
+            except json.JSONDecodeError as e:
+                error = e
+                time.sleep(0.5)
+        raise HistoryReadError(f"{self.path} is not valid JSON: {error}")
+
+    def load(self):
+        """History contents for display: {} when missing or unreadable"""
+        try:
+            return self.read()
+        except HistoryReadError:
+            return {}
+
+    def update(self, results):
+        """Merges results (content_hash -> result) into the history with one rewrite"""
+        if not results:
+            return
+        with self.locked():
+            history = self.read()
+            history.update(results)
+            self._write(history)
+
+    def delete(self, content_hash):
+        """Removes one scan; False when it is not in the history"""
+        with self.locked():
+            history = self.read()
+            if content_hash not in history:
+                return False
+            del history[content_hash]
+            self._write(history)
+            return True
+
+    def clear(self):
+        with self.locked():
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _write(self, history):
+        """Replaces the history file in one step through a temp file unique to this writer (hold the lock)"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(
+            dir=directory, prefix=os.path.basename(self.path) + ".", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(history, f, indent=4)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,149 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import URL_CLIP_SECONDS, URL_PARTIAL_VERDICT_SECONDS
+from services.media_demuxer import MediaDemuxer
+from services.liveness_checker import BlinkTracker, build_video_report, analyze_video_full, DEFAULT_FPS
+from services.audio_analyzer import StreamingAudioAnalyzer, analyze_audio_full, should_stream_audio
+
+
+def combine_video_results(liveness_result, audio_result):
+    """Merge the liveness report and the audio verdict (60/40 confidence weighting)"""
+    combined_confidence = (
+        liveness_result.get("overall_confidence", 0.5) * 0.6 +
+        (0 if audio_result.get("is_fake", False) else 1) * 0.4
+    )
+    return {
+        **liveness_result,
+        "audio_analysis": audio_result,
+        "overall_confidence": round(combined_confidence, 4),
+        "is_fake": liveness_result.get("is_fake", False) or audio_result.get("is_fake", False)
+    }
+
+
+def analyze_video_file(file_path, timings=None):
+    """
+    Liveness + audio verdict of a video file, opening the container once:
+    frames go to the liveness check, PCM to the audio branch.
+    Seconds spent per stage are added to `timings` ("liveness", "audio") when given.
+    """
+    timings = {} if timings is None else timings
+    with MediaDemuxer(file_path) as media:
+        # Long soundtracks are analyzed blockwise while the frames go by
+        audio_stream = None
+        if media.has_audio and should_stream_audio(media.duration_seconds):
+            audio_stream = StreamingAudioAnalyzer(media.audio_sample_rate)
+        
+        # Liveness (blink rate, temporal analysis); frame decoding is counted here
+        start = time.perf_counter()
+        frames = media.frames(audio_sink=audio_stream.push if audio_stream else None)
+        liveness_result = analyze_video_full(file_path, frames=frames, fps=media.fps)
+        timings["liveness"] = timings.get("liveness", 0.0) + time.perf_counter() - start
+        
+        # Audio (skipped up front if there is no audio stream)
+        start = time.perf_counter()
+        if audio_stream:
+            media.feed_audio(audio_stream.push)
+            audio_result = audio_stream.finish()
+        elif media.has_audio:
+            audio_result = analyze_audio_full(file_path, audio=media.audio())
+        else:
+            print(f"   ⚠️ No audio track - skipping audio analysis")
+            audio_result = {
+                "skipped": True,
+                "overall_verdict": "NO AUDIO TRACK",
+                "is_fake": False
+            }
+        timings["audio"] = timings.get("audio", 0.0) + time.perf_counter() - start
+    
+    return combine_video_results(liveness_result, audio_result)
+
+
+class StreamingVideoAnalysis:
+    """
+    Blink and audio analysis of a video that is read while it downloads.
+
+    Frames and audio come from a single MediaDemuxer pass over `source` (e.g. a
+    GrowingFile), so analysis keeps pace with the download instead of waiting
+    for it. Blink rate is measured against media time, not processing time.
+    Audio is analyzed the way analyze_video_file does it: whole in memory for
+    bounded clips, blockwise only when the clip is long enough to stream.
+    """
+
+    def __init__(self, video_path, clip_seconds=URL_CLIP_SECONDS, report_seconds=URL_PARTIAL_VERDICT_SECONDS):
+        self.video_path = video_path
+        self.clip_seconds = clip_seconds
+        self.report_seconds = report_seconds
+        self.tracker = BlinkTracker()
+        self.audio = None          # StreamingAudioAnalyzer for long clips
+        self.audio_chunks = None   # PCM of bounded clips, analyzed whole
+        self.audio_sample_rate = None
+        self.fps = DEFAULT_FPS
+
+    @property
+    def media_seconds(self):
+        return self.tracker.frame_count / self.fps
+
+    def verdict(self, partial):
+        """Combined verdict from everything analyzed so far"""
+        liveness_result = build_video_report(self.tracker.summary(self.media_seconds), self.video_path)
+        if self.audio is not None:
+            audio_result = self.audio.result() if partial else self.audio.finish()
+        elif self.audio_chunks is not None:
+            samples = np.concatenate(self.audio_chunks) if self.audio_chunks else np.zeros(0, dtype=np.float32)
+            audio_result = analyze_audio_full(self.video_path, audio=(samples, self.audio_sample_rate))
+        else:
+            audio_result = {
+                "skipped": True,
+                "overall_verdict": "NO AUDIO TRACK",
+                "is_fake": False
+            }
+        return {
+            "file_type": "video",
+            **combine_video_results(liveness_result, audio_result),
+            "partial": partial,
+            "analyzed_seconds": round(self.media_seconds, 2)
+        }
+
+    def run(self, source, on_partial=None):
+        """
+        Analyze `source` up to `clip_seconds` of video, calling on_partial(verdict)
+        every `report_seconds`. Returns the final verdict.
+        """
+        with MediaDemuxer(source) as media:
+            if not media.has_video:
+                raise ValueError("No video stream")
+            self.fps = media.fps or DEFAULT_FPS
+            if media.has_audio:
+                clip_seconds = self.clip_seconds
+                if media.duration_seconds:
+                    clip_seconds = min(clip_seconds, media.duration_seconds)
+                if should_stream_audio(clip_seconds):
+                    self.audio = StreamingAudioAnalyzer(media.audio_sample_rate)
+                else:
+                    self.audio_chunks = []
+                    self.audio_sample_rate = media.audio_sample_rate
+
+            next_report = self.report_seconds
+            for kind, data in media.iter_packets():
+                if kind == "audio":
+                    if self.audio is not None:
+                        self.audio.push(data)
+                    elif self.audio_chunks is not None:
+                        self.audio_chunks.append(data)
+                    continue
+
+                self.tracker.process_frame(data)
+                if self.media_seconds >= self.clip_seconds:
+                    break
+                if on_partial and self.report_seconds and self.media_seconds >= next_report:
+                    next_report += self.report_seconds
+                    on_partial(self.verdict(partial=True))
+
+        return self.verdict(partial=False)